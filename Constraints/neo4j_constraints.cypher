@@ -11,4 +11,37 @@ CREATE CONSTRAINT unique_keyword_word IF NOT EXISTS FOR (k:Keyword) REQUIRE k.wo
 CREATE INDEX keyword_word_index IF NOT EXISTS FOR (k:Keyword) ON (k.word);
 
 // Unique constraint on Transaction txHash
-CREATE CONSTRAINT unique_transaction IF NOT EXISTS FOR (t:Transaction) REQUIRE t.txHash IS UNIQUE
+CREATE CONSTRAINT unique_transaction IF NOT EXISTS FOR (t:Transaction) REQUIRE t.txHash IS UNIQUE;
+
+// Unique constraint on the graph-wide write version node used to invalidate cached query results
+CREATE CONSTRAINT unique_graph_version IF NOT EXISTS FOR (v:GraphVersion) REQUIRE v.name IS UNIQUE;
+
+// Safes ingested before multi-chain support are mainnet Safes
+MATCH (s:Safe) WHERE s.chain IS NULL SET s.chain = 'eth';
+
+// Safes are keyed by chain and address (the same address can be a different Safe on another chain)
+CREATE CONSTRAINT unique_safe_chain_address IF NOT EXISTS FOR (s:Safe) REQUIRE (s.chain, s.address) IS UNIQUE;
+
+// Safes ingested as Address:Safe nodes: keep the node as the Address (it holds the transfers and ownerships of the
+// address) and move the Safe itself, with its signers and transactions, to a chain-scoped Safe node linked to it
+MATCH (old:Address:Safe)
+REMOVE old:Safe
+CREATE (s:Safe {chain: old.chain, address: old.address, threshold: old.threshold, owners: old.owners})
+MERGE (s)-[:AT_ADDRESS]->(old)
+WITH old, s
+CALL {
+    WITH old, s
+    MATCH (old)-[r:HAS_SIGNER]->(owner)
+    MERGE (s)-[:HAS_SIGNER]->(owner)
+    DELETE r
+}
+CALL {
+    WITH old, s
+    MATCH (old)-[r:HAS_TRANSACTION]->(t)
+    MERGE (s)-[:HAS_TRANSACTION]->(t)
+    DELETE r
+}
+REMOVE old.chain, old.threshold, old.owners;
+
+// Index on Article updated date (incremental fetch watermark)
+CREATE INDEX article_updated_at IF NOT EXISTS FOR (a:Article) ON (a.updated_at);
@@ -0,0 +1,83 @@
+# benchmark_writers.py
+# Measures Safe transaction write throughput with 1/2/4/8 parallel writers (see Tools/parallel_writer.py).
+# The Safe's transactions are fetched once, then written into a scratch database for each writer count.
+# The scratch database is wiped before every measurement, so never point it at a database holding real data.
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+
+# Add the parent directory of 'Projects' to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from Tools.get_safe_data import get_safe_info, iter_transaction_pages
+from Tools.run_journal import RunJournal
+from ingest_safe import SafeIngester, DEFAULT_ADDRESS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROTECTED_DATABASES = {'neo4j', 'system'}
+
+def fetch_transactions(safe_address, max_pages):
+    pages = []
+    for _, transactions, _ in iter_transaction_pages(safe_address):
+        pages.append(transactions)
+        if len(pages) >= max_pages:
+            break
+    return pages
+
+def run_benchmark(safe_address, safe_data, pages, writers, database, journal):
+    ingester = SafeIngester(journal=journal, writers=writers, database=database)
+    try:
+        with ingester.driver.session(database=database) as session:
+            session.run("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS").consume()
+            session.execute_write(ingester.write_safe, safe_address, safe_data)
+
+            start = time.perf_counter()
+            for page_number, transactions in enumerate(pages):
+                ingester.ingest_page(session, None, safe_address, f'benchmark-{writers}-{page_number}', transactions)
+            elapsed = time.perf_counter() - start
+        return elapsed, dict(ingester.writer.stats)
+    finally:
+        ingester.driver.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel Safe transaction writers.")
+    parser.add_argument('--safe', default=DEFAULT_ADDRESS, help='Safe address whose transactions are written.')
+    parser.add_argument('--database', required=True, help='Scratch database to write into (wiped before each run).')
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4, 8], help='Writer counts to measure.')
+    parser.add_argument('--max-pages', type=int, default=20, help='Maximum number of transaction pages to fetch.')
+    args = parser.parse_args()
+
+    if args.database in PROTECTED_DATABASES:
+        parser.error(f"Refusing to wipe the '{args.database}' database. Use a scratch database.")
+
+    safe_data = get_safe_info(args.safe)
+    pages = fetch_transactions(args.safe, args.max_pages)
+    total = sum(len(transactions) for transactions in pages)
+    logger.info(f"Fetched {total} transactions in {len(pages)} pages for Safe {args.safe}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        journal = RunJournal(os.path.join(tmp_dir, 'benchmark_journal.sqlite'))
+        try:
+            for writers in args.writers:
+                elapsed, stats = run_benchmark(args.safe, safe_data, pages, writers, args.database, journal)
+                results.append((writers, elapsed, stats))
+        finally:
+            journal.close()
+
+    baseline = results[0][1]
+    print(f"{'writers':>8} {'seconds':>9} {'tx/s':>9} {'speedup':>8} {'retries':>8} {'deadlocks':>10}")
+    for writers, elapsed, stats in results:
+        print(f"{writers:>8} {elapsed:>9.2f} {total / elapsed:>9.1f} {baseline / elapsed:>7.2f}x "
+              f"{stats.get('transaction_retries', 0):>8} {stats.get('deadlocks', 0):>10}")
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,19 @@
 # ingest_safe.py 
 # This script ingests a Safe address, its owners, assets, transactions and transfers into the graph.
+# Progress is recorded in the local run journal (Tools/run_journal.py): each fetched page of transactions is
+# journaled and marked committed once written, and transactions that fail to ingest are kept as dead letters.
+# --resume continues an interrupted run from the last committed page, --retry-failed replays only the dead letters.
+# Every write transaction also bumps the graph write version, which invalidates cached read results
+# (Tools/run_cypher.py); parallel workers each bump their own partition's version node.
+# With --writers N, each page is written by N parallel workers partitioned by transaction hash prefix
+# (Tools/parallel_writer.py), after the Address nodes the page shares are created serially. Every transaction
+# of a page is linked to the same Safe node, and creating that relationship locks the Safe, so the workers of
+# one page largely serialize on it: --writers mostly pays off on the transfer writes. Safes themselves are
+# written in parallel across chains (--wallets-csv).
+# Safe addresses may carry a chain prefix (e.g. matic:0x..., as in app.safe.global links); unprefixed addresses are
+# mainnet Safes. Safe nodes are keyed by (chain, address) and linked to the chain-independent Address node of
+# their address, which transfers and owners refer to. --wallets-csv ingests every Safe in the contributor
+# wallet sheet, fetching each chain concurrently.
 
 import sys
 import os
@@ -18,7 +32,11 @@ tools_dir = os.path.abspath(os.path.join(project_root, 'Tools'))
 sys.path.insert(0, tools_dir)
 
 try:
-    from Tools.get_safe_data import get_safe_data
+    from Tools.get_safe_data import (get_safe_info, iter_transaction_pages, parse_chain_address, for_each_chain,
+                                     load_wallet_safes, WALLETS_CSV)
+    from Tools.run_journal import RunJournal
+    from Tools.run_cypher import bump_write_version
+    from Tools.parallel_writer import ParallelWriter, precreate
 except ImportError as e:
     print(f"Error importing get_safe_data: {e}")
     sys.exit(1)
@@ -39,51 +57,174 @@ NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD')
 # Default address (replace with your default Safe address)
 DEFAULT_ADDRESS = '0xFFe1bcF92156f50c78F0B6dE4B5fAa3fAA6AdB52'
 
+JOURNAL_PIPELINE = 'safe'
+
+PRECREATE_ADDRESSES_QUERY = """
+UNWIND $rows AS address
+MERGE (:Address {address: address})
+"""
+
+def tx_hash_of(tx):
+    # Use safeTxHash if available, otherwise use transactionHash
+    return tx.get('safeTxHash') or tx.get('transactionHash')
+
+def chain_key(safe_address):
+    # Normalize to the chain-prefixed form used as the journal target, e.g. "eth:0x..."
+    chain, address = parse_chain_address(safe_address)
+    return f"{chain}:{address}"
+
+
 class SafeIngester:
-    def __init__(self):
+    def __init__(self, journal=None, writers=1, database=None):
         self.driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+        self.journal = journal or RunJournal()
+        self.database = database
+        self.writer = ParallelWriter(self.driver, workers=writers, database=database, bump_version=True)
 
     def close(self):
         self.driver.close()
+        self.journal.close()
 
-    def ingest_safe(self, safe_address):
-        with self.driver.session() as session:
-            safe_data = get_safe_data(safe_address)
-            
-            if not safe_data:
-                logging.error(f"Failed to fetch data for Safe address: {safe_address}")
+    def ingest_safes(self, safe_addresses, resume=False):
+        """Ingests many Safes, fetching each chain concurrently within that chain's rate budget."""
+        def ingest(safe_address):
+            # One Safe failing must not stop the other Safes on its chain; its run stays open for --resume
+            try:
+                self.ingest_safe(safe_address, resume=resume)
+            except Exception as e:
+                logging.error(f"Failed to ingest Safe {safe_address}: {e}. Run again with --resume to continue it.")
+
+        for_each_chain(safe_addresses, ingest)
+
+    def ingest_safe(self, safe_address, resume=False):
+        safe_address = chain_key(safe_address)
+        run_id, _, resumed = self.journal.start_run(JOURNAL_PIPELINE, safe_address, resume=resume)
+
+        with self.driver.session(database=self.database) as session:
+            try:
+                safe_data = get_safe_info(safe_address)
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Failed to fetch data for Safe address {safe_address}: {e}")
                 return
 
-            self.ingest_main_safe_node(session, safe_data)
-            self.ingest_multisig_owners(session, safe_address, safe_data['owners'])
-            self.ingest_transactions(session, safe_address, safe_data['transactions'])
+            session.execute_write(self.write_safe, safe_address, safe_data)
+
+            # Finish the pages a previous attempt fetched but didn't commit, then carry on from where it stopped
+            pages = self.journal.pages(run_id) if resumed else []
+            for page in pages:
+                if not page['committed']:
+                    self.ingest_page(session, run_id, safe_address, page['page_key'], page['payload'])
+            if pages and pages[-1]['next_key'] is None:
+                logging.info(f"All transaction pages for Safe {safe_address} were already fetched.")
+            else:
+                start_url = pages[-1]['next_key'] if pages else None
+                try:
+                    for url, transactions, next_url in iter_transaction_pages(safe_address, start_url):
+                        self.journal.record_page(run_id, url, transactions, next_url)
+                        self.ingest_page(session, run_id, safe_address, url, transactions)
+                except requests.exceptions.RequestException as e:
+                    logging.error(f"Failed to fetch transactions for Safe {safe_address}: {e}. "
+                                  f"Run again with --resume to continue from the last committed page.")
+                    return
+
+        self.journal.finish_run(run_id)
+        self.writer.log_stats()
+        logging.info(f"Finished ingesting Safe {safe_address} (run {run_id}).")
+
+    def ingest_page(self, session, run_id, safe_address, page_key, transactions):
+        # Addresses shared by many transfers are created serially so the parallel workers don't contend on them
+        addresses = {transfer[side] for tx in transactions for transfer in tx.get('transfers', [])
+                     for side in ('from', 'to') if transfer.get(side)}
+        try:
+            precreate(session, PRECREATE_ADDRESSES_QUERY, sorted(addresses))
+        except Exception as e:
+            # Dead-letter the whole page instead of failing the run (and the other Safes of --wallets-csv);
+            # --retry-failed writes the transactions one by one, which needs no pre-created Addresses
+            logging.error(f"Error creating the addresses of a page for Safe {safe_address}: {e}")
+            for tx in transactions:
+                self.journal.fail_item(JOURNAL_PIPELINE, safe_address, tx_hash_of(tx), e, tx, run_id)
+            self.journal.commit_page(run_id, page_key)
+            return
+
+        # The writer falls back to one transaction per item to isolate failures. All partitions MERGE
+        # (s)-[:HAS_TRANSACTION]->(t) on this page's one Safe node, so they queue on its lock for that statement
+        committed, failed = self.writer.write(
+            transactions,
+            lambda tx: (tx_hash_of(tx) or '')[:6],
+            lambda graph_tx, batch: self.write_transactions(graph_tx, safe_address, batch)
+        )
+        self.journal.commit_items(JOURNAL_PIPELINE, safe_address,
+                                  [tx_hash_of(tx) for tx in committed if tx_hash_of(tx)], run_id)
+        for tx, e in failed:
+            logging.error(f"Error ingesting transaction {tx_hash_of(tx)} for Safe {safe_address}: {e}")
+            self.journal.fail_item(JOURNAL_PIPELINE, safe_address, tx_hash_of(tx), e, tx, run_id)
+        self.journal.commit_page(run_id, page_key)
+        logging.info(f"Committed page of {len(transactions)} transactions for Safe {safe_address}.")
+
+    def retry_failed(self, safe_address=None):
+        """Replays only the transactions in the dead-letter list, optionally limited to one Safe."""
+        safe_address = chain_key(safe_address) if safe_address else None
+        failed = self.journal.failed_items(JOURNAL_PIPELINE, safe_address)
+        logging.info(f"Retrying {len(failed)} failed transactions.")
+        with self.driver.session(database=self.database) as session:
+            for item in failed:
+                self.ingest_transactions(session, item['target'], [item['payload']])
+        remaining = len(self.journal.failed_items(JOURNAL_PIPELINE, safe_address))
+        logging.info(f"{len(failed) - remaining} transactions recovered, {remaining} still failing.")
+
+    def write_safe(self, tx, safe_address, safe_data):
+        self.ingest_main_safe_node(tx, safe_data)
+        self.ingest_multisig_owners(tx, safe_address, safe_data['owners'])
+        bump_write_version(tx)
+
+    def write_transactions(self, tx, safe_address, transactions):
+        for safe_tx in transactions:
+            self.ingest_transaction(tx, safe_address, safe_tx)
+
+    def write_transactions_and_bump(self, tx, safe_address, transactions):
+        self.write_transactions(tx, safe_address, transactions)
+        bump_write_version(tx)
 
     def ingest_main_safe_node(self, session, safe_data):
         query = """
-        MERGE (s:Address:Safe {address: $address})
+        MERGE (s:Safe {chain: $chain, address: $address})
         SET s.threshold = $threshold,
             s.owners = $owners
+        // The Address node is shared by the Safes at this address on every chain, and by transfers and owners
+        MERGE (a:Address {address: $address})
+        MERGE (s)-[:AT_ADDRESS]->(a)
         """
-        session.run(query, address=safe_data['address'], threshold=safe_data['threshold'], owners=safe_data['owners'])
+        session.run(query, chain=safe_data['chain'], address=safe_data['address'],
+                    threshold=safe_data['threshold'], owners=safe_data['owners'])
 
     def ingest_multisig_owners(self, session, safe_address, owners):
         query = """
-        MATCH (s:Safe {address: $safe_address})
+        MATCH (s:Safe {chain: $chain, address: $safe_address})
         UNWIND $owners as owner
         MERGE (o:Address {address: owner})
         MERGE (s)-[:HAS_SIGNER]->(o)
         """
-        session.run(query, safe_address=safe_address, owners=owners)
+        chain, address = parse_chain_address(safe_address)
+        session.run(query, chain=chain, safe_address=address, owners=owners)
 
-    def ingest_transactions(self, session, safe_address, transactions):
+    def ingest_transactions(self, session, safe_address, transactions, run_id=None):
         for tx in transactions:
-            self.ingest_transaction(session, safe_address, tx)
+            tx_hash = tx_hash_of(tx)
+            try:
+                session.execute_write(self.write_transactions_and_bump, safe_address, [tx])
+            except Exception as e:
+                logging.error(f"Error ingesting transaction {tx_hash} for Safe {safe_address}: {e}")
+                self.journal.fail_item(JOURNAL_PIPELINE, safe_address, tx_hash, e, tx, run_id)
+                continue
+            if tx_hash:
+                self.journal.commit_item(JOURNAL_PIPELINE, safe_address, tx_hash, run_id)
 
     def ingest_transaction(self, session, safe_address, tx):
         query = """
-        MATCH (s:Safe {address: $safe_address})
+        MATCH (s:Safe {chain: $chain, address: $safe_address})
         MERGE (t:Transaction {txHash: $txHash})
-        SET t.submissionDate = $submissionDate,
+        SET t.chain = $chain,
+            t.submissionDate = $submissionDate,
             t.executionDate = $executionDate,
             t.transactionHash = $transactionHash,
             t.safeTxHash = $safeTxHash,
@@ -103,8 +244,7 @@ class SafeIngester:
         data_decoded = tx.get('dataDecoded', {})
         method = data_decoded.get('method') if isinstance(data_decoded, dict) else None
 
-        # Use safeTxHash if available, otherwise use transactionHash
-        tx_hash = tx.get('safeTxHash') or tx.get('transactionHash')
+        tx_hash = tx_hash_of(tx)
         if not tx_hash:
             logging.warning(f"Transaction without hash encountered: {tx}")
             return
@@ -119,8 +259,10 @@ class SafeIngester:
             logging.warning(f"Transaction {tx_hash} already exists in the database.")
             return
 
+        chain, address = parse_chain_address(safe_address)
         session.run(query, 
-                    safe_address=safe_address,
+                    chain=chain,
+                    safe_address=address,
                     txHash=tx_hash,
                     safeTxHash=tx.get('safeTxHash'),
                     transactionHash=tx.get('transactionHash'),
@@ -180,14 +322,27 @@ class SafeIngester:
 
 def main():
     parser = argparse.ArgumentParser(description="Ingest Safe data into Neo4j.")
-    parser.add_argument('--safe', help='Safe address to ingest.')
+    parser.add_argument('--safe', help='Safe address to ingest, optionally chain-prefixed (e.g. matic:0x...).')
+    parser.add_argument('--wallets-csv', nargs='?', const=WALLETS_CSV,
+                        help='Ingest every Safe in the contributor wallet sheet (default sheet if no path is given).')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the last unfinished run for this Safe from its last committed page.')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='Only replay transactions that failed in previous runs.')
+    parser.add_argument('--writers', type=int, default=1,
+                        help='Number of parallel graph writers (default: %(default)s).')
     args = parser.parse_args()
 
     safe_address = args.safe or DEFAULT_ADDRESS
 
-    ingester = SafeIngester()
+    ingester = SafeIngester(writers=args.writers)
     try:
-        ingester.ingest_safe(safe_address)
+        if args.retry_failed:
+            ingester.retry_failed(args.safe)
+        elif args.wallets_csv:
+            ingester.ingest_safes(load_wallet_safes(args.wallets_csv), resume=args.resume)
+        else:
+            ingester.ingest_safe(safe_address, resume=args.resume)
     finally:
         ingester.close()
 
@@ -15,23 +15,42 @@
 # - Creates a ChatPromptTemplate for article analysis.
 
 # fetch_articles():
-# - Makes a GET request to the Spaceflight News API and retrieves a list of articles.
+# - Uses the latest published_at/updated_at already in the graph (minus WATERMARK_OVERLAP) as watermarks.
+# - Fetches only articles published after the published_at watermark, plus articles edited upstream after the
+#   updated_at watermark, paging by timestamp (keyset) instead of by offset.
+# - Records each fetched page in the local run journal (see Tools/run_journal.py), so a resumed run reuses them.
 
 # process_article(article):
 # - Uses Langchain to analyze an article and extract keywords and topics.
 # - Formats the prompt with the article content and invokes the language model.
 # - Parses the output into a structured ArticleAnalysis object.
 
+# write_article(tx, article, terms, duplicate):
+# - Writes an article, its keyword/topic relationships and its DUPLICATE_OF link in one transaction.
+#   The Keyword/Topic nodes (with their aliases and BELONGS_TO links) already exist, so it only MATCHes them. The parallel writer bumps
+#   the graph write version in the same transaction (one version node per partition), so cached read results
+#   (Tools/run_cypher.py) are invalidated.
+
 # ingest_articles(articles):
 # - Processes each fetched article using process_article().
 # - Creates or updates an Article node in the Neo4j database for each article.
+# - Canonicalizes each keyword and topic against the names already in the graph (see Tools/canonicalize.py),
+#   so spelling/casing variants map to one node and are recorded in its aliases property.
+# - Skips the LLM call for near-duplicates of an already analyzed article (see Tools/near_duplicates.py),
+#   reusing its analysis and linking the copy to it with a DUPLICATE_OF relationship.
 # - Creates Keyword and Topic nodes based on the analysis, and establishes relationships between Article, Keyword, and Topic nodes.
 # - Logs the ingestion process, including any errors.
+# - Analyzed articles are written in groups of WRITE_BATCH_SIZE by --writers parallel workers partitioned by article id
+#   (see Tools/parallel_writer.py), after their shared Keyword and Topic nodes are created and linked serially.
+# - Records committed articles in the run journal, and failed articles with the reason so --retry-failed can replay them.
 
 # verify_ingestion():
 # - Checks the number of Article nodes in the database to verify the ingestion process.
 
 # Main execution:
+# - Starts a journaled run, or continues the last unfinished one with --resume (or replays failed articles with --retry-failed).
+# - --backfill-report analyzes and ingests the articles a bulk import (Tools/bulk_import.py) left out for lack of a
+#   cached analysis; they are older than the watermarks, so regular runs never fetch them.
 # - Fetches articles from the API.
 # - Processes and ingests the articles into the database.
 # - Verifies the ingestion by counting the articles in the database.
@@ -50,8 +69,21 @@ from langchain.prompts import ChatPromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field, ValidationError
 from typing import List
-import time
-from datetime import datetime, timedelta
+import json
+from datetime import datetime, timedelta, timezone
+import sys
+
+# Add the parent directory of 'Projects' to the Python path so the shared Tools package can be imported
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, project_root)
+
+from Tools.canonicalize import TermCanonicalizer
+from Tools.near_duplicates import NearDuplicateIndex, DEFAULT_THRESHOLD
+from Tools.run_journal import RunJournal
+from Tools.get_snapi_articles import iter_article_pages, iter_articles_by_id
+from Tools.run_cypher import bump_write_version
+from Tools.parallel_writer import ParallelWriter, precreate
+import argparse
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -79,7 +111,18 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
 
-SPACEFLIGHT_NEWS_API_URL = "https://api.spaceflightnewsapi.net/v4/articles"
+# Local MinHash index of recently analyzed articles, used to reuse analyses for syndicated copies
+DUPLICATE_INDEX_PATH = os.path.join(script_dir, '..', 'Cache', 'article_index.json')
+
+# Name and target of this pipeline's runs in the run journal
+JOURNAL_PIPELINE = 'snapi'
+JOURNAL_TARGET = 'articles'
+
+# Overlap subtracted from the watermarks, to catch articles that became visible in the API late
+WATERMARK_OVERLAP = timedelta(hours=1)
+
+# Analyzed articles are written in groups of this size, spread over the parallel writers
+WRITE_BATCH_SIZE = 20
 
 # Define the output structure
 class KeywordTopic(BaseModel):
@@ -109,44 +152,63 @@ prompt = ChatPromptTemplate.from_template(
     "Article: {article}\n\n"
     "{format_instructions}"
 )
-# Fetch articles from the Spaceflight News API within the last 7 days
-def fetch_articles():
-    all_articles = []
-    page = 0
-    limit = 100  # Maximum allowed by the API
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=7)
-    
-    while True:
-        try:
-            params = {
-                'limit': limit,
-                'offset': page * limit,
-                'published_at_gte': start_date.isoformat(),
-                'published_at_lte': end_date.isoformat(),
-                'ordering': '-published_at'  # Latest articles first
-            }
-            response = requests.get(SPACEFLIGHT_NEWS_API_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            articles = data['results']
-            all_articles.extend(articles)
-            
-            if len(articles) < limit:
-                break  # No more articles to fetch
-            
-            page += 1
-            
-            # Respect rate limits (10 requests per second)
-            time.sleep(0.1)
-        
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error fetching articles: {e}")
-            break
-    
-    logging.info(f"Fetched {len(all_articles)} articles from the last 7 days.")
-    return all_articles
+# Read the latest published_at/updated_at already stored in the graph, minus a small overlap
+def get_watermarks():
+    with driver.session() as session:
+        watermarks = {}
+        for field in ('published_at', 'updated_at'):
+            record = session.run(
+                f"MATCH (a:Article) WHERE a.{field} IS NOT NULL "
+                f"RETURN toString(a.{field}) AS value ORDER BY a.{field} DESC LIMIT 1"
+            ).single()
+            if record:
+                latest = datetime.fromisoformat(record['value'].replace('Z', '+00:00'))
+                watermarks[field] = (latest - WATERMARK_OVERLAP).isoformat()
+
+    # Empty graph: fall back to the last 7 days. Articles stored before updated_at was recorded: use published_at.
+    default = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
+    published_since = watermarks.get('published_at', default)
+    return published_since, watermarks.get('updated_at', published_since)
+
+# Fetch articles whose published_at or updated_at is at or after the given timestamp
+def fetch_since(field, since, journal=None, run_id=None, journaled_pages=()):
+    articles = []
+    state = None
+
+    # Reuse the pages this run already fetched before it was interrupted
+    for journaled_page in journaled_pages:
+        articles.extend(journaled_page['payload'])
+    if journaled_pages:
+        if journaled_pages[-1]['next_key'] is None:
+            return articles
+        state = json.loads(journaled_pages[-1]['next_key'])
+
+    try:
+        for page_state, page_articles, next_state in iter_article_pages(field, since, state):
+            articles.extend(page_articles)
+            if journal and run_id:
+                journal.record_page(run_id, f"{field}|{page_state['cursor']}|{page_state['offset']}", page_articles,
+                                    json.dumps(next_state) if next_state else None)
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error fetching articles: {e}")
+        raise
+
+    return articles
+
+# Fetch articles published, or edited upstream, since the watermarks
+def fetch_articles(published_since=None, updated_since=None, journal=None, run_id=None):
+    if published_since is None or updated_since is None:
+        published_since, updated_since = get_watermarks()
+    journaled = journal.pages(run_id) if journal and run_id else []
+
+    all_articles = {}
+    for field, since in (('published_at', published_since), ('updated_at', updated_since)):
+        pages = [page for page in journaled if page['page_key'].startswith(f'{field}|')]
+        for article in fetch_since(field, since, journal, run_id, pages):
+            all_articles[article['id']] = article
+
+    logging.info(f"Fetched {len(all_articles)} articles published since {published_since} or updated since {updated_since}.")
+    return list(all_articles.values())
 
 # Process an article to extract keywords and topics
 def process_article(article):
@@ -171,70 +233,230 @@ def process_article(article):
         logging.error(f"Validation error processing article {article['id']}: {ve}")
         # Handle or re-raise exception as needed
 
+# Write an analyzed article and its keyword/topic relationships; runs as a single write transaction
+def write_article(tx, article, terms, duplicate=None):
+    # Create or update the Article node
+    result = tx.run(
+        """
+        MERGE (a:Article {id: $id})
+        SET a.title = $title,
+            a.url = $url,
+            a.image_url = $image_url,
+            a.news_site = $news_site,
+            a.summary = $summary,
+            a.published_at = datetime($published_at),
+            a.updated_at = datetime($updated_at),
+            a.processed = true
+        RETURN a.id AS id
+        """,
+        id=article['id'],
+        title=article['title'],
+        url=article['url'],
+        image_url=article['image_url'],
+        news_site=article['news_site'],
+        summary=article['summary'],
+        published_at=article['published_at'],
+        updated_at=article.get('updated_at')
+    )
+    article_id = result.single()['id']
+
+    # Link the keyword nodes created by precreate_terms (which also links them to their topics).
+    # Creating the relationship locks the Keyword node, so take those locks in a consistent (sorted) order
+    for keyword, _, _, _, item in sorted(terms, key=lambda term: term[0]):
+        tx.run(
+            """
+            MATCH (a:Article {id: $article_id})
+            MATCH (k:Keyword {word: $keyword})
+            MERGE (a)-[r:CONTAINS_KEYWORD]->(k)
+            SET r.relevance_score = $relevance_score,
+                r.context = $context
+            """,
+            article_id=article_id,
+            keyword=keyword,
+            relevance_score=item.relevance_score,
+            context=item.context
+        )
+
+    if duplicate:
+        original_id, similarity, _ = duplicate
+        tx.run(
+            """
+            MATCH (a:Article {id: $article_id}), (o:Article {id: $original_id})
+            MERGE (a)-[d:DUPLICATE_OF]->(o)
+            SET d.similarity = $similarity
+            """,
+            article_id=article_id,
+            original_id=original_id,
+            similarity=similarity
+        )
+
+    return article_id
+
+# Refresh the properties of an article that was edited upstream; its analysis is kept
+def refresh_article(tx, article):
+    tx.run(
+        """
+        MATCH (a:Article {id: $id})
+        SET a.title = $title,
+            a.url = $url,
+            a.image_url = $image_url,
+            a.news_site = $news_site,
+            a.summary = $summary,
+            a.updated_at = datetime($updated_at)
+        """,
+        id=article['id'],
+        title=article['title'],
+        url=article['url'],
+        image_url=article['image_url'],
+        news_site=article['news_site'],
+        summary=article['summary'],
+        updated_at=article.get('updated_at')
+    )
+    bump_write_version(tx)
+
+PRECREATE_TERMS_QUERY = """
+UNWIND $rows AS row
+MERGE (n:{label} {{{key}: row.name}})
+WITH n, [alias IN row.aliases WHERE NOT alias IN coalesce(n.aliases, [])] AS new_aliases
+WHERE size(new_aliases) > 0
+SET n.aliases = coalesce(n.aliases, []) + new_aliases
+"""
+
+PRECREATE_BELONGS_TO_QUERY = """
+UNWIND $rows AS row
+MATCH (k:Keyword {word: row.keyword}), (t:Topic {name: row.topic})
+MERGE (k)-[:BELONGS_TO]->(t)
+"""
+
+# Serially create the Keyword and Topic nodes a batch of articles shares, record their new aliases and link each
+# keyword to its topic, before the parallel write. The workers then never write to Topic nodes; they only lock
+# the Keyword nodes they link their article to (relationship creation locks both end nodes), in sorted order.
+def precreate_terms(session, analyzed):
+    keywords, topics, pairs = {}, {}, set()
+    for _, terms, _ in analyzed:
+        for keyword, keyword_alias, topic, topic_alias, _ in terms:
+            keywords.setdefault(keyword, set()).update([keyword_alias] if keyword_alias else [])
+            topics.setdefault(topic, set()).update([topic_alias] if topic_alias else [])
+            pairs.add((keyword, topic))
+    for label, key, names in (('Keyword', 'word', keywords), ('Topic', 'name', topics)):
+        rows = [{'name': name, 'aliases': sorted(aliases)} for name, aliases in sorted(names.items())]
+        precreate(session, PRECREATE_TERMS_QUERY.format(label=label, key=key), rows)
+    precreate(session, PRECREATE_BELONGS_TO_QUERY,
+              [{'keyword': keyword, 'topic': topic} for keyword, topic in sorted(pairs)])
+
 # Ingest articles into the Neo4j database
-def ingest_articles(articles):
-    with driver.session() as session:
-        for article in articles:
-            try:
-                # Check if the article already exists in the database
-                result = session.run(
-                    "MATCH (a:Article {id: $id}) RETURN a.id AS id",
-                    id=article['id']
-                )
-                if result.single():
+def ingest_articles(articles, duplicate_index=None, journal=None, run_id=None, writers=1):
+    if duplicate_index is None:
+        duplicate_index = NearDuplicateIndex(DUPLICATE_INDEX_PATH).load()
+    writer = ParallelWriter(driver, workers=writers, batch_size=1, bump_version=True)
+    canonicalizer = TermCanonicalizer()
+
+    try:
+        with driver.session() as session:
+            # Load the existing keywords and topics once per run so LLM spelling variants map onto them
+            canonicalizer.load(session)
+            _ingest_with_session(session, articles, duplicate_index, canonicalizer, writer, journal, run_id)
+    finally:
+        # Keep the analyses already paid for, even if the run fails, so retries and resumes reuse them
+        duplicate_index.save()
+
+    canonicalizer.log_stats()
+    writer.log_stats()
+    logging.info(f"Saved {duplicate_index.duplicates_found} LLM calls by reusing analyses of near-duplicate articles.")
+    logging.info(f"Attempted to ingest {len(articles)} articles into the database.")
+
+# Analyze articles and write them in groups through the parallel writer
+def _ingest_with_session(session, articles, duplicate_index, canonicalizer, writer, journal, run_id):
+    # Analyzed articles waiting to be written, as (article, terms, duplicate)
+    analyzed = []
+
+    def flush():
+        if not analyzed:
+            return
+        try:
+            precreate_terms(session, analyzed)
+            committed, failed = writer.write(
+                analyzed,
+                lambda entry: entry[0]['id'],
+                lambda tx, batch: [write_article(tx, *entry) for entry in batch]
+            )
+        except Exception as e:
+            # The serial pre-create failed: dead-letter the whole group so --retry-failed can replay it
+            committed, failed = [], [(entry, e) for entry in analyzed]
+        finally:
+            analyzed.clear()
+        for article, _, _ in committed:
+            logging.info(f"Processed and ingested article with ID: {article['id']}")
+            if journal:
+                journal.commit_item(JOURNAL_PIPELINE, JOURNAL_TARGET, article['id'], run_id)
+        for (article, _, _), e in failed:
+            logging.error(f"Error processing article {article['id']}: {e}")
+            if journal:
+                journal.fail_item(JOURNAL_PIPELINE, JOURNAL_TARGET, article['id'], e, article, run_id)
+
+    for article in articles:
+        if journal and run_id and journal.is_committed(JOURNAL_PIPELINE, article['id'], run_id):
+            logging.info(f"Article with ID {article['id']} was already committed by this run. Skipping.")
+            continue
+
+        try:
+            # Check if the article already exists in the database, and whether it was edited upstream since
+            result = session.run(
+                """
+                MATCH (a:Article {id: $id})
+                RETURN a.id AS id, a.updated_at IS NULL OR a.updated_at < datetime($updated_at) AS edited
+                """,
+                id=article['id'],
+                updated_at=article.get('updated_at')
+            )
+            existing = result.single()
+            if existing:
+                if existing['edited'] and article.get('updated_at'):
+                    session.execute_write(refresh_article, article)
+                    logging.info(f"Article with ID {article['id']} was edited upstream. Refreshed its properties.")
+                else:
                     logging.info(f"Article with ID {article['id']} already exists. Skipping.")
-                    continue
+                # Also clears a dead-letter entry for an article that another run ingested after it failed
+                if journal:
+                    journal.commit_item(JOURNAL_PIPELINE, JOURNAL_TARGET, article['id'], run_id)
+                continue
 
+            # Reuse the analysis of an earlier attempt at this article (e.g. a failed write), or of an already
+            # analyzed copy of the same story, otherwise ask the LLM
+            cached = duplicate_index.entries.get(str(article['id']))
+            duplicate = None if cached else duplicate_index.find_duplicate(article)
+            if cached:
+                analysis = ArticleAnalysis(**cached['analysis'])
+                logging.info(f"Reusing the analysis of article {article['id']} from an earlier attempt.")
+            elif duplicate:
+                original_id, similarity, cached_analysis = duplicate
+                analysis = ArticleAnalysis(**cached_analysis)
+                logging.info(f"Article {article['id']} is a near-duplicate of {original_id} "
+                             f"(similarity {similarity:.2f}). Reusing its analysis.")
+                # The original has to be written before the DUPLICATE_OF link to it
+                if any(pending['id'] == original_id for pending, _, _ in analyzed):
+                    flush()
+            else:
                 # Process the article to extract keywords and topics
                 analysis = process_article(article)
-                
-                # Create or update the Article node
-                result = session.run(
-                    """
-                    MERGE (a:Article {id: $id})
-                    SET a.title = $title,
-                        a.url = $url,
-                        a.image_url = $image_url,
-                        a.news_site = $news_site,
-                        a.summary = $summary,
-                        a.published_at = datetime($published_at),
-                        a.processed = true
-                    RETURN a.id AS id
-                    """,
-                    id=article['id'],
-                    title=article['title'],
-                    url=article['url'],
-                    image_url=article['image_url'],
-                    news_site=article['news_site'],
-                    summary=article['summary'],
-                    published_at=article['published_at']
-                )
-                article_id = result.single()['id']
-                
-                # Create keyword and topic nodes, and relationships with properties
-                for item in analysis.keywords_topics:
-                    session.run(
-                        """
-                        MATCH (a:Article {id: $article_id})
-                        MERGE (k:Keyword {word: $keyword})
-                        MERGE (t:Topic {name: $topic})
-                        MERGE (a)-[r:CONTAINS_KEYWORD]->(k)
-                        SET r.relevance_score = $relevance_score,
-                            r.context = $context
-                        MERGE (k)-[b:BELONGS_TO]->(t)
-                        """,
-                        article_id=article_id,
-                        keyword=item.keyword,
-                        topic=item.topic,
-                        relevance_score=item.relevance_score,
-                        context=item.context
-                    )
-                
-                logging.info(f"Processed and ingested article with ID: {article_id}")
-            except Exception as e:
-                logging.error(f"Error processing article {article['id']}: {e}")
-    
-    logging.info(f"Attempted to ingest {len(articles)} articles into the database.")
+                if analysis is None:
+                    raise ValueError("LLM output failed validation")
+                duplicate_index.add(article, analysis.dict())
+            
+            # Map the LLM's keyword/topic spellings onto the canonical names before writing
+            terms = [(*canonicalizer.keyword(item.keyword), *canonicalizer.topic(item.topic), item)
+                     for item in analysis.keywords_topics]
+            analyzed.append((article, terms, duplicate))
+        except Exception as e:
+            logging.error(f"Error processing article {article['id']}: {e}")
+            if journal:
+                journal.fail_item(JOURNAL_PIPELINE, JOURNAL_TARGET, article['id'], e, article, run_id)
+
+        # Write the article, its keywords/topics and the duplicate link in one transaction per article
+        if len(analyzed) >= WRITE_BATCH_SIZE:
+            flush()
+
+    flush()
 
 # Verify the ingestion by counting the articles in the database
 def verify_ingestion():
@@ -245,15 +467,52 @@ def verify_ingestion():
 
 # Main execution block
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest Spaceflight News articles into Neo4j.")
+    parser.add_argument('--duplicate-threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Similarity above which an article reuses the analysis of an earlier copy '
+                             '(higher = more precise, lower = fewer LLM calls; default: %(default)s).')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the last unfinished run, reusing its fetched pages and skipping committed articles.')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='Only replay articles that failed in previous runs.')
+    parser.add_argument('--writers', type=int, default=1,
+                        help='Number of parallel graph writers (default: %(default)s).')
+    parser.add_argument('--backfill-report',
+                        help='Only ingest the articles listed as without analysis in a bulk import report.')
+    args = parser.parse_args()
+
+    journal = RunJournal()
     try:
-        articles = fetch_articles()
-        logging.info(f"Fetched {len(articles)} articles from the API.")
-        ingest_articles(articles)
+        duplicate_index = NearDuplicateIndex(DUPLICATE_INDEX_PATH, threshold=args.duplicate_threshold).load()
+        if args.retry_failed:
+            failed = journal.failed_items(JOURNAL_PIPELINE)
+            logging.info(f"Retrying {len(failed)} failed articles.")
+            ingest_articles([item['payload'] for item in failed], duplicate_index, journal, writers=args.writers)
+            logging.info(f"{len(journal.failed_items(JOURNAL_PIPELINE))} articles still failing.")
+        elif args.backfill_report:
+            with open(args.backfill_report, 'r', encoding='utf-8') as f:
+                article_ids = json.load(f)['articles_without_analysis']
+            articles = [article for page in iter_articles_by_id(article_ids) for article in page]
+            logging.info(f"Fetched {len(articles)} of the {len(article_ids)} articles left out by the bulk import.")
+            ingest_articles(articles, duplicate_index, journal, writers=args.writers)
+        else:
+            # A resumed run keeps the watermarks it started with
+            published_since, updated_since = get_watermarks()
+            run_id, params, _ = journal.start_run(
+                JOURNAL_PIPELINE, JOURNAL_TARGET,
+                {'published_since': published_since, 'updated_since': updated_since},
+                resume=args.resume
+            )
+            articles = fetch_articles(params['published_since'], params['updated_since'], journal, run_id)
+            logging.info(f"Fetched {len(articles)} articles from the API.")
+            ingest_articles(articles, duplicate_index, journal, run_id, writers=args.writers)
+            journal.finish_run(run_id)
         verify_ingestion()
         logging.info("Data ingestion completed successfully.")
     except requests.exceptions.RequestException as e:
-        logging.error(f"Error fetching articles: {e}")
+        logging.error(f"Error fetching articles: {e}. Run again with --resume to continue from the last fetched page.")
     except Exception as e:
         logging.error(f"An unexpected error occurred: {e}")
     finally:
+        journal.close()
         driver.close()
\ No newline at end of file
@@ -0,0 +1,100 @@
+# benchmark_writers.py
+# Measures article write throughput with 1/2/4/8 parallel writers (see Tools/parallel_writer.py), the SNAPI
+# counterpart of Projects/Executive Operations/Scripts/benchmark_writers.py.
+# Articles are fetched once and reuse the analyses cached in the near-duplicate index, so no LLM calls are made.
+# They are then written into a scratch database for each writer count, in groups of WRITE_BATCH_SIZE like
+# ingest_articles does. The scratch database is wiped before every measurement, so never point it at a database
+# holding real data.
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+# Add the parent directory of 'Projects' to the Python path so the shared Tools package can be imported
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, project_root)
+
+from Tools.get_snapi_articles import iter_article_pages
+from Tools.near_duplicates import NearDuplicateIndex
+from Tools.canonicalize import TermCanonicalizer
+from Tools.parallel_writer import ParallelWriter
+from SNAPI_ingestion import (driver, ArticleAnalysis, write_article, precreate_terms, DUPLICATE_INDEX_PATH,
+                             WRITE_BATCH_SIZE)
+
+logger = logging.getLogger(__name__)
+
+PROTECTED_DATABASES = {'neo4j', 'system'}
+
+def fetch_analyzed(duplicate_index, max_articles):
+    """Fetches articles whose analysis is cached, as (article, terms, None) entries ready for write_article."""
+    if not duplicate_index.entries:
+        return []
+    since = min(entry['published_at'] for entry in duplicate_index.entries.values())
+    canonicalizer = TermCanonicalizer()
+    analyzed = []
+    for _, articles, _ in iter_article_pages('published_at', since):
+        for article in articles:
+            entry = duplicate_index.entries.get(str(article['id']))
+            if not entry:
+                continue
+            analysis = ArticleAnalysis(**entry['analysis'])
+            terms = [(*canonicalizer.keyword(item.keyword), *canonicalizer.topic(item.topic), item)
+                     for item in analysis.keywords_topics]
+            analyzed.append((article, terms, None))
+            if len(analyzed) >= max_articles:
+                return analyzed
+    return analyzed
+
+def run_benchmark(analyzed, writers, database):
+    writer = ParallelWriter(driver, workers=writers, batch_size=1, database=database, bump_version=True)
+    with driver.session(database=database) as session:
+        session.run("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS").consume()
+
+        # Same grouping as ingest_articles: serial pre-create, then the parallel write
+        start = time.perf_counter()
+        for offset in range(0, len(analyzed), WRITE_BATCH_SIZE):
+            group = analyzed[offset:offset + WRITE_BATCH_SIZE]
+            precreate_terms(session, group)
+            writer.write(
+                group,
+                lambda entry: entry[0]['id'],
+                lambda tx, batch: [write_article(tx, *entry) for entry in batch]
+            )
+        elapsed = time.perf_counter() - start
+    return elapsed, dict(writer.stats)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel article writers.")
+    parser.add_argument('--database', required=True, help='Scratch database to write into (wiped before each run).')
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4, 8], help='Writer counts to measure.')
+    parser.add_argument('--max-articles', type=int, default=200, help='Maximum number of articles to write.')
+    args = parser.parse_args()
+
+    if args.database in PROTECTED_DATABASES:
+        parser.error(f"Refusing to wipe the '{args.database}' database. Use a scratch database.")
+
+    duplicate_index = NearDuplicateIndex(DUPLICATE_INDEX_PATH).load()
+    analyzed = fetch_analyzed(duplicate_index, args.max_articles)
+    if not analyzed:
+        parser.error(f"No cached analyses in {DUPLICATE_INDEX_PATH}. Run SNAPI_ingestion.py first.")
+    total = len(analyzed)
+    logger.info(f"Fetched {total} articles with cached analyses")
+
+    results = []
+    try:
+        for writers in args.writers:
+            elapsed, stats = run_benchmark(analyzed, writers, args.database)
+            results.append((writers, elapsed, stats))
+    finally:
+        driver.close()
+
+    baseline = results[0][1]
+    print(f"{'writers':>8} {'seconds':>9} {'articles/s':>11} {'speedup':>8} {'retries':>8} {'deadlocks':>10}")
+    for writers, elapsed, stats in results:
+        print(f"{writers:>8} {elapsed:>9.2f} {total / elapsed:>11.1f} {baseline / elapsed:>7.2f}x "
+              f"{stats.get('transaction_retries', 0):>8} {stats.get('deadlocks', 0):>10}")
+
+if __name__ == '__main__':
+    main()
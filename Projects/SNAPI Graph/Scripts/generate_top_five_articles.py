@@ -1,8 +1,15 @@
 import os
+import sys
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
 from datetime import datetime
 
+# Add the parent directory of 'Projects' to the Python path so the shared Tools package can be imported
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, project_root)
+
+from Tools.run_cypher import cached_read
+
 # Load environment variables
 load_dotenv()
 NEO4J_URI = os.getenv('NEO4J_URI')
@@ -38,7 +45,8 @@ class NewsletterGenerator:
         LIMIT 5
         """
         with self.driver.session() as session:
-            result = session.run(query)
+            # Served from the query cache until the next ingestion bumps the graph write version
+            result = cached_read(session, query)
             articles = []
             for record in result:
                 article = record['article']
@@ -0,0 +1,158 @@
+# merge_duplicate_terms.py
+# One-off job that collapses Keyword and Topic nodes which are spelling/casing variants of each other
+# (e.g. "SpaceX", "Spacex", "Space X") into a single canonical node.
+#
+# - The most connected variant becomes the canonical node; the other names are recorded in its aliases property.
+# - Relationships of the duplicates are re-pointed to the canonical node before the duplicates are deleted.
+# - Run with --dry-run first to review the planned merges. The job refuses to run if the threshold would merge
+#   known-different terms (see DISTINCT_TERMS in Tools/canonicalize.py).
+
+import os
+import sys
+import logging
+import argparse
+from collections import defaultdict
+from neo4j import GraphDatabase
+from dotenv import load_dotenv
+
+# Add the parent directory of 'Projects' to the Python path so the shared Tools package can be imported
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, project_root)
+
+from Tools.canonicalize import TrigramIndex, DEFAULT_SIMILARITY_THRESHOLD, check_distinct_terms
+from Tools.run_cypher import bump_write_version
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Load the .env file from the project directory, same as SNAPI_ingestion.py
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.env'))
+
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USER = os.getenv("NEO4J_USER")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+
+# Per label: the name property and the query returning each node's name, aliases and degree
+TERM_QUERIES = {
+    'Keyword': ('word', """
+        MATCH (k:Keyword)
+        RETURN k.word AS name, coalesce(k.aliases, []) AS aliases, COUNT { (k)--() } AS degree
+        ORDER BY degree DESC, name
+    """),
+    'Topic': ('name', """
+        MATCH (t:Topic)
+        RETURN t.name AS name, coalesce(t.aliases, []) AS aliases, COUNT { (t)--() } AS degree
+        ORDER BY degree DESC, name
+    """),
+}
+
+MERGE_KEYWORD_QUERIES = [
+    # Re-point article links, keeping the higher relevance score when both nodes were linked to the article
+    """
+    MATCH (a:Article)-[r:CONTAINS_KEYWORD]->(dup:Keyword {word: $duplicate})
+    MATCH (canon:Keyword {word: $canonical})
+    MERGE (a)-[nr:CONTAINS_KEYWORD]->(canon)
+    ON CREATE SET nr = properties(r)
+    ON MATCH SET nr.relevance_score = CASE WHEN coalesce(r.relevance_score, 0) > coalesce(nr.relevance_score, 0)
+                                           THEN r.relevance_score ELSE nr.relevance_score END
+    DELETE r
+    """,
+    """
+    MATCH (dup:Keyword {word: $duplicate})-[r:BELONGS_TO]->(t:Topic)
+    MATCH (canon:Keyword {word: $canonical})
+    MERGE (canon)-[:BELONGS_TO]->(t)
+    DELETE r
+    """,
+]
+
+MERGE_TOPIC_QUERIES = [
+    """
+    MATCH (k:Keyword)-[r:BELONGS_TO]->(dup:Topic {name: $duplicate})
+    MATCH (canon:Topic {name: $canonical})
+    MERGE (k)-[:BELONGS_TO]->(canon)
+    DELETE r
+    """,
+]
+
+def plan_merges(session, label, threshold):
+    """
+    Groups the existing names of a label into canonical names and their duplicates.
+
+    Args:
+        session: An open Neo4j session.
+        label (str): 'Keyword' or 'Topic'.
+        threshold (float): Trigram similarity threshold for fuzzy matches.
+
+    Returns:
+        dict: canonical name -> list of duplicate names to merge into it.
+    """
+    _, query = TERM_QUERIES[label]
+    index = TrigramIndex(threshold)
+    merges = defaultdict(list)
+
+    # Names are visited by descending degree, so the most connected variant becomes canonical
+    for record in session.run(query):
+        canonical, _ = index.lookup(record['name'])
+        if canonical is None:
+            index.add(record['name'], record['aliases'])
+        else:
+            merges[canonical].append(record['name'])
+    return merges
+
+def merge_duplicate(tx, label, canonical, duplicate):
+    key, _ = TERM_QUERIES[label]
+    queries = MERGE_KEYWORD_QUERIES if label == 'Keyword' else MERGE_TOPIC_QUERIES
+    for query in queries:
+        tx.run(query, canonical=canonical, duplicate=duplicate)
+
+    # Carry over the duplicate's name and aliases, then remove it
+    tx.run(
+        f"""
+        MATCH (dup:{label} {{{key}: $duplicate}}), (canon:{label} {{{key}: $canonical}})
+        WITH dup, canon, [name IN [dup.{key}] + coalesce(dup.aliases, [])
+                          WHERE NOT name IN coalesce(canon.aliases, [])] AS new_aliases
+        SET canon.aliases = coalesce(canon.aliases, []) + new_aliases
+        DETACH DELETE dup
+        """,
+        canonical=canonical,
+        duplicate=duplicate
+    )
+    bump_write_version(tx)
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge duplicate Keyword and Topic nodes into canonical nodes.")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_SIMILARITY_THRESHOLD,
+                        help='Trigram similarity threshold for fuzzy matches (default: %(default)s).')
+    parser.add_argument('--dry-run', action='store_true', help='Only log the planned merges.')
+    args = parser.parse_args()
+
+    # Merges delete the duplicate nodes, so refuse to run if known-different terms would be merged
+    merged = check_distinct_terms(args.threshold)
+    if merged:
+        parser.error(f"Threshold {args.threshold} would merge different terms: {merged}")
+
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    stats = {}
+    try:
+        with driver.session() as session:
+            for label in TERM_QUERIES:
+                merges = plan_merges(session, label, args.threshold)
+                collapsed = 0
+                for canonical, duplicates in merges.items():
+                    logger.info(f"{label} '{canonical}' <- {duplicates}")
+                    if args.dry_run:
+                        collapsed += len(duplicates)
+                        continue
+                    for duplicate in duplicates:
+                        session.execute_write(merge_duplicate, label, canonical, duplicate)
+                        collapsed += 1
+                stats[label] = (len(merges), collapsed)
+    finally:
+        driver.close()
+
+    for label, (canonicals, collapsed) in stats.items():
+        verb = 'would be collapsed' if args.dry_run else 'collapsed'
+        logger.info(f"{label}: {collapsed} duplicate nodes {verb} into {canonicals} canonical nodes")
+
+if __name__ == '__main__':
+    main()
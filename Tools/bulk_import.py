@@ -0,0 +1,411 @@
+# bulk_import.py
+# Offline backfill: writes node and relationship CSVs in `neo4j-admin database import` format from the Safe data,
+# the Spaceflight News articles (with the analyses cached in the near-duplicate index) and the contributor CSVs,
+# so a new environment can be built with one offline import instead of hours of transactional MERGEs.
+#
+# - Rows are streamed to the CSV files page by page; IDs already written are tracked in a temporary SQLite
+#   database rather than in memory, so memory stays bounded however large the backfill is.
+# - Articles are exported from the oldest article in the near-duplicate index on, by default. Articles without a
+#   cached analysis are left out and their ids listed in the report; after the import, analyze and ingest them with
+#   `SNAPI_ingestion.py --backfill-report <output>/import_report.json` (the regular incremental run won't fetch
+#   them, as they are older than its watermark).
+# - A validation report with the node/relationship counts per label/type is written next to the CSVs. With
+#   --compare it also holds the counts of an existing graph built by the transactional path.
+#
+# Usage:
+#   python Tools/bulk_import.py --output import/ --wallets-csv --compare
+#   neo4j-admin database import full --nodes=import/nodes_address.csv --nodes=import/nodes_safe.csv ... \
+#       --relationships=import/rels_has_signer.csv ... neo4j
+#
+# Each CSV file has its own header, so neo4j-admin needs one --nodes/--relationships flag per file (files passed
+# to a single flag share the first file's header). The full command is logged at the end of the export.
+
+import os
+import sys
+import csv
+import glob
+import json
+import sqlite3
+import logging
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+# Allow running as a script from anywhere
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Tools.get_safe_data import get_safe_info, iter_transaction_pages, parse_chain_address, for_each_chain, \
+    load_wallet_safes, WALLETS_CSV
+from Tools.get_snapi_articles import iter_article_pages
+from Tools.canonicalize import TermCanonicalizer
+from Tools.near_duplicates import NearDuplicateIndex
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATABASES_DIR = os.path.join(PROJECT_ROOT, 'Projects', 'Executive Operations', 'Databases')
+PERSONS_CSV = os.path.join(DATABASES_DIR, 'Project Report & Contributor Data - person.csv')
+ARTICLE_INDEX_PATH = os.path.join(PROJECT_ROOT, 'Projects', 'SNAPI Graph', 'Cache', 'article_index.json')
+
+# Header of each CSV file; the file name is nodes_<key>.csv or rels_<key>.csv
+NODE_HEADERS = {
+    'address': ['address:ID(Address)', ':LABEL'],
+    'safe': [':ID(Safe)', 'address', 'chain', 'threshold:int', 'owners:string[]', ':LABEL'],
+    'transaction': ['txHash:ID(Transaction)', 'chain', 'submissionDate', 'executionDate', 'transactionHash',
+                    'safeTxHash', 'nonce:long', 'isExecuted:boolean', 'isSuccessful:boolean', 'ethGasPrice',
+                    'maxFeePerGas', 'maxPriorityFeePerGas', 'gasUsed:long', 'fee', 'origin', 'method', ':LABEL'],
+    'transfer': ['transactionHash:ID(Transfer)', 'type', 'value', 'tokenSymbol', 'tokenDecimals:int', ':LABEL'],
+    'article': [':ID(Article)', 'id:long', 'title', 'url', 'image_url', 'news_site', 'summary',
+                'published_at:datetime', 'updated_at:datetime', 'processed:boolean', ':LABEL'],
+    'keyword': ['word:ID(Keyword)', 'aliases:string[]', ':LABEL'],
+    'topic': ['name:ID(Topic)', 'aliases:string[]', ':LABEL'],
+    'person': [':ID(Person)', 'name', 'discord', ':LABEL'],
+    'graph_version': ['name:ID(GraphVersion)', 'version:long', ':LABEL'],
+}
+REL_HEADERS = {
+    'at_address': [':START_ID(Safe)', ':END_ID(Address)', ':TYPE'],
+    'has_signer': [':START_ID(Safe)', ':END_ID(Address)', ':TYPE'],
+    'has_transaction': [':START_ID(Safe)', ':END_ID(Transaction)', ':TYPE'],
+    'has_transfer': [':START_ID(Transaction)', ':END_ID(Transfer)', ':TYPE'],
+    'is_from': [':START_ID(Transfer)', ':END_ID(Address)', ':TYPE'],
+    'sent_to': [':START_ID(Transfer)', ':END_ID(Address)', ':TYPE'],
+    'contains_keyword': [':START_ID(Article)', ':END_ID(Keyword)', 'relevance_score:float', 'context', ':TYPE'],
+    'belongs_to': [':START_ID(Keyword)', ':END_ID(Topic)', ':TYPE'],
+    'duplicate_of': [':START_ID(Article)', ':END_ID(Article)', 'similarity:float', ':TYPE'],
+    'owns_address': [':START_ID(Person)', ':END_ID(Address)', 'type', ':TYPE'],
+}
+
+# Labels and relationship types compared against the transactional graph
+REPORT_LABELS = ['Address', 'Safe', 'Transaction', 'Transfer', 'Article', 'Keyword', 'Topic', 'Person']
+REPORT_TYPES = ['AT_ADDRESS', 'HAS_SIGNER', 'HAS_TRANSACTION', 'HAS_TRANSFER', 'IS_FROM', 'SENT_TO', 'CONTAINS_KEYWORD',
+                'BELONGS_TO', 'DUPLICATE_OF', 'OWNS_ADDRESS']
+
+def _value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (list, tuple)):
+        return ';'.join(str(v) for v in value)
+    return value
+
+class SeenStore:
+    """Disk-backed set of the node IDs and relationships already written, plus the Keyword/Topic aliases."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE seen (space TEXT, key TEXT, PRIMARY KEY (space, key)) WITHOUT ROWID")
+        self.conn.execute("CREATE TABLE aliases (label TEXT, name TEXT, alias TEXT, PRIMARY KEY (label, name, alias))")
+        self._pending = 0
+
+    def add(self, space, key):
+        """Returns True if the key is new in its space."""
+        cursor = self.conn.execute("INSERT OR IGNORE INTO seen VALUES (?, ?)", (space, str(key)))
+        self._pending += 1
+        if self._pending >= 10000:
+            self.conn.commit()
+            self._pending = 0
+        return cursor.rowcount == 1
+
+    def contains(self, space, key):
+        return self.conn.execute("SELECT 1 FROM seen WHERE space = ? AND key = ?", (space, str(key))).fetchone() is not None
+
+    def add_alias(self, label, name, alias):
+        self.conn.execute("INSERT OR IGNORE INTO aliases VALUES (?, ?, ?)", (label, name, alias))
+
+    def aliases(self, label):
+        """Yields (name, [aliases]) for every name of a label, in name order."""
+        rows = self.conn.execute(
+            "SELECT s.key, a.alias FROM seen s LEFT JOIN aliases a ON a.label = s.space AND a.name = s.key "
+            "WHERE s.space = ? ORDER BY s.key", (label,)
+        )
+        current, current_aliases = None, []
+        for name, alias in rows:
+            if name != current:
+                if current is not None:
+                    yield current, current_aliases
+                current, current_aliases = name, []
+            if alias:
+                current_aliases.append(alias)
+        if current is not None:
+            yield current, current_aliases
+
+    def close(self):
+        self.conn.close()
+
+class BulkImportWriter:
+    """Streams deduplicated nodes and relationships to neo4j-admin import CSV files."""
+
+    def __init__(self, output_dir, work_dir):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.seen = SeenStore(os.path.join(work_dir, 'seen.sqlite'))
+        self.canonicalizer = TermCanonicalizer()
+        self.counts = defaultdict(int)
+        self.stats = defaultdict(int)
+        self.unanalyzed = []
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def _writer(self, prefix, key, header):
+        name = f'{prefix}_{key}'
+        if name not in self._files:
+            f = open(os.path.join(self.output_dir, f'{name}.csv'), 'w', newline='', encoding='utf-8')
+            writer = csv.writer(f)
+            writer.writerow(header)
+            self._files[name] = (f, writer)
+        return self._files[name][1]
+
+    def node(self, key, space, node_id, row, count_as):
+        """Writes a node unless its ID was already written. Returns True if it was written."""
+        if not self.seen.add(space, node_id):
+            return False
+        self._writer('nodes', key, NODE_HEADERS[key]).writerow([_value(v) for v in row])
+        for label in count_as.split(';'):
+            self.counts[label] += 1
+        return True
+
+    def rel(self, key, start, end, rel_type, props=()):
+        if not self.seen.add(f'rel:{rel_type}', f'{start}|{end}'):
+            return
+        self._writer('rels', key, REL_HEADERS[key]).writerow([start, end, *[_value(v) for v in props], rel_type])
+        self.counts[rel_type] += 1
+
+    def address(self, address):
+        # One Address node per address, shared by the Safes at it on every chain, transfers and owners
+        self.node('address', 'Address', address, [address, 'Address'], 'Address')
+        return address
+
+    # Safes
+
+    def add_safes(self, safe_addresses):
+        for_each_chain(safe_addresses, self._add_safe)
+
+    def _add_safe(self, safe_address):
+        chain, address = parse_chain_address(safe_address)
+        safe_id = f'{chain}:{address}'
+        try:
+            safe_data = get_safe_info(safe_address)
+            with self._lock:
+                self.node('safe', 'Safe', safe_id,
+                          [safe_id, address, chain, safe_data.get('threshold'), safe_data.get('owners', []), 'Safe'],
+                          'Safe')
+                self.rel('at_address', safe_id, self.address(address), 'AT_ADDRESS')
+                for owner in safe_data.get('owners', []):
+                    self.rel('has_signer', safe_id, self.address(owner), 'HAS_SIGNER')
+
+            for _, transactions, _ in iter_transaction_pages(safe_address):
+                with self._lock:
+                    for tx in transactions:
+                        self._add_transaction(safe_id, chain, tx)
+            logger.info(f"Exported Safe {safe_id}")
+        except Exception as e:
+            # The Safe's remaining pages are missing from the export; the transactional path can fill them in
+            logger.error(f"Failed to export Safe {safe_id}: {e}")
+            with self._lock:
+                self.stats['safes_failed'] += 1
+
+    def _add_transaction(self, safe_id, chain, tx):
+        tx_hash = tx.get('safeTxHash') or tx.get('transactionHash')
+        if not tx_hash:
+            return
+        data_decoded = tx.get('dataDecoded', {})
+        method = data_decoded.get('method') if isinstance(data_decoded, dict) else None
+        # The transactional path skips transactions that already exist, transfers included
+        if not self.node('transaction', 'Transaction', tx_hash,
+                         [tx_hash, chain, tx.get('submissionDate'), tx.get('executionDate'), tx.get('transactionHash'),
+                          tx.get('safeTxHash'), tx.get('nonce'), tx.get('isExecuted'), tx.get('isSuccessful'),
+                          tx.get('ethGasPrice'), tx.get('maxFeePerGas'), tx.get('maxPriorityFeePerGas'),
+                          tx.get('gasUsed'), tx.get('fee'), tx.get('origin'), method, 'Transaction'],
+                         'Transaction'):
+            return
+        self.rel('has_transaction', safe_id, tx_hash, 'HAS_TRANSACTION')
+
+        for transfer in tx.get('transfers', []):
+            transfer_id = transfer['transactionHash']
+            token_info = transfer.get('tokenInfo') or {}
+            self.node('transfer', 'Transfer', transfer_id,
+                      [transfer_id, transfer['type'], transfer['value'], token_info.get('symbol'),
+                       token_info.get('decimals'), 'Transfer'], 'Transfer')
+            self.rel('has_transfer', tx_hash, transfer_id, 'HAS_TRANSFER')
+            if transfer.get('from'):
+                self.rel('is_from', transfer_id, self.address(transfer['from']), 'IS_FROM')
+            if transfer.get('to'):
+                self.rel('sent_to', transfer_id, self.address(transfer['to']), 'SENT_TO')
+
+    # Articles
+
+    def add_articles(self, since, article_index):
+        for _, articles, _ in iter_article_pages('published_at', since):
+            for article in articles:
+                self._add_article(article, article_index)
+
+    def _add_article(self, article, article_index):
+        entry = article_index.entries.get(str(article['id']))
+        duplicate = None
+        if entry:
+            analysis = entry['analysis']
+        else:
+            duplicate = article_index.find_duplicate(article)
+            if not duplicate:
+                self.stats['articles_without_analysis'] += 1
+                self.unanalyzed.append(article['id'])
+                return
+            analysis = duplicate[2]
+
+        article_id = str(article['id'])
+        if not self.node('article', 'Article', article_id,
+                         [article_id, article['id'], article['title'], article['url'], article.get('image_url'),
+                          article.get('news_site'), article.get('summary'), article.get('published_at'),
+                          article.get('updated_at'), True, 'Article'], 'Article'):
+            return
+
+        for item in analysis.get('keywords_topics', []):
+            keyword, keyword_alias = self.canonicalizer.keyword(item['keyword'])
+            topic, topic_alias = self.canonicalizer.topic(item['topic'])
+            # Keyword and Topic nodes are written at the end, once all their aliases are known
+            self.seen.add('Keyword', keyword)
+            self.seen.add('Topic', topic)
+            if keyword_alias:
+                self.seen.add_alias('Keyword', keyword, keyword_alias)
+            if topic_alias:
+                self.seen.add_alias('Topic', topic, topic_alias)
+            self.rel('contains_keyword', article_id, keyword, 'CONTAINS_KEYWORD',
+                     [item.get('relevance_score'), item.get('context')])
+            self.rel('belongs_to', keyword, topic, 'BELONGS_TO')
+
+        # Originals are older, so they were already exported unless they predate --articles-since
+        if duplicate and self.seen.contains('Article', str(duplicate[0])):
+            self.rel('duplicate_of', article_id, str(duplicate[0]), 'DUPLICATE_OF', [duplicate[1]])
+
+    # Contributors
+
+    def add_contributors(self, persons_csv, wallets_csv):
+        with open(persons_csv, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                name = (row.get('Common Name') or '').strip()
+                discord = (row.get('Discord Handle') or '').strip()
+                if not name:
+                    continue
+                # The wallet sheet identifies people by their common name followed by their Discord handle
+                person_id = f'{name}{discord}'
+                self.node('person', 'Person', person_id, [person_id, name, discord, 'Person'], 'Person')
+                for column, wallet_type in (('Payout Address (Must be EOA)', 'Personal - Payout (EOA)'),
+                                            ('Signing/Other Wallet(s)', 'Personal - Signing/Other'),
+                                            ('VOID Address(es)', 'Void'),
+                                            ('vMOONEY Safe(s)', 'vMOONEY Safe')):
+                    for address in (row.get(column) or '').split(','):
+                        if address.strip():
+                            self.rel('owns_address', person_id, self.address(address.strip()), 'OWNS_ADDRESS',
+                                     [wallet_type])
+
+        with open(wallets_csv, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                person_id = (row.get('name') or '').strip()
+                address = (row.get('Address') or '').strip()
+                if person_id and address and self.seen.contains('Person', person_id):
+                    self.rel('owns_address', person_id, self.address(address), 'OWNS_ADDRESS', [row.get('Type')])
+
+    def finish(self):
+        """Writes the Keyword/Topic nodes and the graph version node, then closes the files."""
+        for label, key in (('Keyword', 'keyword'), ('Topic', 'topic')):
+            writer = self._writer('nodes', key, NODE_HEADERS[key])
+            for name, aliases in self.seen.aliases(label):
+                writer.writerow([name, _value(aliases), label])
+                self.counts[label] += 1
+        self._writer('nodes', 'graph_version', NODE_HEADERS['graph_version']).writerow(['global', 1, 'GraphVersion'])
+
+        for f, _ in self._files.values():
+            f.close()
+        self.seen.close()
+
+    def import_command(self, database='<database>'):
+        """Builds the neo4j-admin command importing the written files, with one flag per file."""
+        flags = [f"--{'nodes' if name.startswith('nodes_') else 'relationships'}="
+                 f"{os.path.join(self.output_dir, f'{name}.csv')}"
+                 for name in sorted(self._files)]
+        return ' '.join(['neo4j-admin database import full', *flags, database])
+
+def graph_counts():
+    """Counts nodes per label and relationships per type in the graph built by the transactional path."""
+    from Tools.run_cypher import run_cypher
+    counts = {}
+    for label in REPORT_LABELS:
+        counts[label] = run_cypher(f"MATCH (n:{label}) RETURN count(n) AS count")[0]['count']
+    for rel_type in REPORT_TYPES:
+        counts[rel_type] = run_cypher(f"MATCH ()-[r:{rel_type}]->() RETURN count(r) AS count")[0]['count']
+    return counts
+
+def write_report(output_dir, counts, stats, compare_counts=None, unanalyzed=()):
+    """
+    Writes import_report.json and logs the counts, side by side with the transactional graph's if given.
+    The report also lists the ids of the articles left out for lack of a cached analysis.
+    """
+    report = {'stats': dict(stats), 'counts': {}, 'articles_without_analysis': list(unanalyzed)}
+    for name in REPORT_LABELS + REPORT_TYPES:
+        entry = {'bulk_import': counts.get(name, 0)}
+        if compare_counts is not None:
+            entry['transactional'] = compare_counts.get(name, 0)
+            entry['difference'] = entry['bulk_import'] - entry['transactional']
+        report['counts'][name] = entry
+
+    with open(os.path.join(output_dir, 'import_report.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    for name, entry in report['counts'].items():
+        line = f"{name:>18}: {entry['bulk_import']:>9}"
+        if compare_counts is not None:
+            line += f"   transactional {entry['transactional']:>9}   difference {entry['difference']:>+7}"
+        logger.info(line)
+    for name, value in stats.items():
+        logger.info(f"{name}: {value}")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Write neo4j-admin import CSVs for a cold backfill.")
+    parser.add_argument('--output', required=True, help='Directory to write the CSV files and report to.')
+    parser.add_argument('--safe', action='append', default=[],
+                        help='Safe address to export, optionally chain-prefixed (repeatable).')
+    parser.add_argument('--wallets-csv', nargs='?', const=WALLETS_CSV,
+                        help='Export every Safe in the contributor wallet sheet (default sheet if no path is given).')
+    parser.add_argument('--articles-since',
+                        help='Export articles published since this timestamp '
+                             '(default: the oldest article with a cached analysis).')
+    parser.add_argument('--article-index', default=ARTICLE_INDEX_PATH,
+                        help='Near-duplicate index holding the cached article analyses.')
+    parser.add_argument('--persons-csv', default=PERSONS_CSV, help='Contributor sheet to export.')
+    parser.add_argument('--compare', action='store_true',
+                        help='Compare the counts with the graph the transactional path built (needs NEO4J_* env).')
+    args = parser.parse_args()
+
+    if glob.glob(os.path.join(args.output, '*.csv')):
+        parser.error(f"{args.output} already contains CSV files.")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        exporter = BulkImportWriter(args.output, work_dir)
+        safes = args.safe + (load_wallet_safes(args.wallets_csv) if args.wallets_csv else [])
+        if safes:
+            exporter.add_safes(safes)
+
+        # No retention window: a backfill should use every analysis the index holds
+        article_index = NearDuplicateIndex(args.article_index, retention_days=36500).load()
+        published = [entry['published_at'] for entry in article_index.entries.values() if entry.get('published_at')]
+        articles_since = args.articles_since or (min(published) if published else None)
+        if articles_since:
+            exporter.add_articles(articles_since, article_index)
+        else:
+            logger.warning(f"No cached analyses in {args.article_index}; no articles exported.")
+        exporter.add_contributors(args.persons_csv, args.wallets_csv or WALLETS_CSV)
+        exporter.finish()
+
+    write_report(args.output, exporter.counts, exporter.stats, graph_counts() if args.compare else None,
+                 exporter.unanalyzed)
+    if exporter.unanalyzed:
+        logger.info(f"After the import, analyze the {len(exporter.unanalyzed)} articles left out with: "
+                    f"python SNAPI_ingestion.py --backfill-report {args.output}/import_report.json")
+    logger.info(f"Import with: {exporter.import_command()}")
+
+if __name__ == '__main__':
+    main()
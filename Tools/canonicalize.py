@@ -0,0 +1,214 @@
+# canonicalize.py
+# Maps spelling, casing and spacing variants of Keyword/Topic names (e.g. "SpaceX", "Spacex", "Space X")
+# onto a single canonical name so the LLM output doesn't fragment the graph.
+
+import re
+import logging
+import unicodedata
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Minimum trigram similarity for two names to be treated as the same term
+DEFAULT_SIMILARITY_THRESHOLD = 0.85
+
+# Names shorter than this (without spaces) are only matched exactly - trigrams are too noisy for them
+MIN_FUZZY_LENGTH = 5
+
+_NON_ALNUM = re.compile(r'[\W_]+', re.UNICODE)
+_DIGITS = re.compile(r'\d+')
+_ROMAN_NUMERAL = re.compile(r'^m{0,3}(cm|cd|d?c{0,3})(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})$')
+
+# Pairs of different terms that fuzzy matching must keep apart; checked by merge_duplicate_terms.py before it merges
+DISTINCT_TERMS = [
+    ('Artemis II', 'Artemis III'),
+    ('Artemis I', 'Artemis II'),
+    ('Starlink 6-1', 'Starlink 6-2'),
+    ('Falcon 9 Block 5', 'Falcon 9 Block 4'),
+    ('Apollo XI', 'Apollo XII'),
+    ('Type A', 'Type B'),
+]
+
+def normalize_term(term):
+    """
+    Applies Unicode, case and whitespace normalization to a keyword or topic name.
+
+    Args:
+        term (str): The raw name as produced by the LLM.
+
+    Returns:
+        str: The normalized name, e.g. "  Space-X " -> "space x".
+    """
+    if not term:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', term)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(' ', stripped.casefold()).strip()
+
+def _designators(key):
+    """
+    Returns the tokens of a normalized name that designate a specific instance of a term: numbers,
+    Roman numerals and single letters. "Artemis II" and "Artemis III" only differ in these.
+    """
+    tokens = [token for token in key.split()
+              if not _DIGITS.search(token) and (len(token) == 1 or _ROMAN_NUMERAL.match(token))]
+    return _DIGITS.findall(key) + tokens
+
+def _trigrams(compact):
+    padded = f"  {compact} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TrigramIndex:
+    """
+    In-memory index of canonical names that resolves new names by exact normalized match first,
+    then by trigram Jaccard similarity.
+    """
+
+    def __init__(self, threshold=DEFAULT_SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._by_key = {}                     # normalized or compacted name -> canonical name
+        self._trigrams = {}                   # canonical name -> trigram set
+        self._postings = defaultdict(set)     # trigram -> canonical names
+
+    def __len__(self):
+        return len(self._trigrams)
+
+    def add(self, canonical, aliases=()):
+        """Registers a canonical name and any known aliases that should resolve to it."""
+        for name in (canonical, *aliases):
+            key = normalize_term(name)
+            if not key:
+                continue
+            self._by_key.setdefault(key, canonical)
+            self._by_key.setdefault(key.replace(' ', ''), canonical)
+
+        if canonical not in self._trigrams:
+            grams = _trigrams(normalize_term(canonical).replace(' ', ''))
+            self._trigrams[canonical] = grams
+            for gram in grams:
+                self._postings[gram].add(canonical)
+
+    def lookup(self, name):
+        """
+        Finds the canonical name for a given name without modifying the index.
+
+        Args:
+            name (str): The name to resolve.
+
+        Returns:
+            tuple: (canonical name or None, match type - 'exact', 'fuzzy' or None)
+        """
+        key = normalize_term(name)
+        if not key:
+            return None, None
+
+        compact = key.replace(' ', '')
+        for candidate in (key, compact):
+            if candidate in self._by_key:
+                return self._by_key[candidate], 'exact'
+
+        if len(compact) < MIN_FUZZY_LENGTH:
+            return None, None
+
+        grams = _trigrams(compact)
+        overlaps = defaultdict(int)
+        for gram in grams:
+            for canonical in self._postings.get(gram, ()):
+                overlaps[canonical] += 1
+
+        # Names that differ in their numbers or designators ("Starlink 6-1" vs "Starlink 6-2",
+        # "Artemis II" vs "Artemis III") are different terms
+        designators = _designators(key)
+        best, best_score = None, 0.0
+        for canonical, overlap in overlaps.items():
+            other = self._trigrams[canonical]
+            score = overlap / (len(grams) + len(other) - overlap)
+            if score > best_score and _designators(normalize_term(canonical)) == designators:
+                best, best_score = canonical, score
+
+        if best_score >= self.threshold:
+            return best, 'fuzzy'
+        return None, None
+
+def check_distinct_terms(threshold=DEFAULT_SIMILARITY_THRESHOLD):
+    """
+    Verifies that none of the DISTINCT_TERMS pairs resolve to each other at a threshold.
+
+    Returns:
+        list: The pairs that would be merged; empty if all are kept apart.
+    """
+    merged = []
+    for first, second in DISTINCT_TERMS:
+        for existing, new in ((first, second), (second, first)):
+            index = TrigramIndex(threshold)
+            index.add(existing)
+            if index.lookup(new)[0] is not None:
+                merged.append((existing, new))
+    return merged
+
+class TermCanonicalizer:
+    """
+    Resolves Keyword and Topic names against indexes of the names already in the graph.
+    Load once per run with load(session), then call keyword()/topic() for every LLM-produced name.
+    """
+
+    def __init__(self, threshold=DEFAULT_SIMILARITY_THRESHOLD):
+        self.indexes = {
+            'Keyword': TrigramIndex(threshold),
+            'Topic': TrigramIndex(threshold),
+        }
+        self.stats = defaultdict(int)
+
+    def load(self, session):
+        """Loads the existing Keyword and Topic names (and their recorded aliases) from the graph."""
+        keywords = session.run(
+            "MATCH (k:Keyword) RETURN k.word AS name, coalesce(k.aliases, []) AS aliases"
+        )
+        for record in keywords:
+            self.indexes['Keyword'].add(record['name'], record['aliases'])
+
+        topics = session.run(
+            "MATCH (t:Topic) RETURN t.name AS name, coalesce(t.aliases, []) AS aliases"
+        )
+        for record in topics:
+            self.indexes['Topic'].add(record['name'], record['aliases'])
+
+        logger.info(f"Loaded {len(self.indexes['Keyword'])} keywords and {len(self.indexes['Topic'])} topics "
+                    f"into the canonicalization index")
+        return self
+
+    def resolve(self, label, name):
+        """
+        Resolves a name to its canonical form, registering it as a new canonical name if nothing matches.
+
+        Args:
+            label (str): 'Keyword' or 'Topic'.
+            name (str): The raw name as produced by the LLM.
+
+        Returns:
+            tuple: (canonical name, alias) where alias is the raw name if it differs from the canonical one, else None.
+        """
+        index = self.indexes[label]
+        canonical, match = index.lookup(name)
+        if canonical is None:
+            canonical = name.strip()
+            index.add(canonical)
+            self.stats[f'{label}_new'] += 1
+        else:
+            self.stats[f'{label}_{match}'] += 1
+
+        alias = name.strip()
+        return canonical, (alias if alias != canonical else None)
+
+    def keyword(self, name):
+        return self.resolve('Keyword', name)
+
+    def topic(self, name):
+        return self.resolve('Topic', name)
+
+    def log_stats(self):
+        for label in self.indexes:
+            logger.info(f"{label} canonicalization: {self.stats[f'{label}_new']} new, "
+                        f"{self.stats[f'{label}_exact']} exact matches, {self.stats[f'{label}_fuzzy']} fuzzy matches")
+
+__all__ = ['normalize_term', 'TrigramIndex', 'TermCanonicalizer', 'check_distinct_terms', 'DISTINCT_TERMS']
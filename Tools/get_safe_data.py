@@ -1,8 +1,16 @@
+import os
+import csv
 import requests
 import logging
 import json
 import sys
+import time
+import threading
 from datetime import datetime
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse, parse_qs
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -11,47 +19,207 @@ logger = logging.getLogger(__name__)
 # Add file handler for logging
 def setup_file_logging(address):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_filename = f"safe_data_{address}_{timestamp}.log"
+    log_filename = f"safe_data_{address.replace(':', '_')}_{timestamp}.log"
     file_handler = logging.FileHandler(log_filename)
     file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
     logger.addHandler(file_handler)
     return log_filename
 
+# Safe transaction service per chain, keyed by the chain prefix app.safe.global uses in addresses (e.g. matic:0x...)
+CHAIN_SERVICE_URLS = {
+    'eth': 'https://safe-transaction-mainnet.safe.global',
+    'matic': 'https://safe-transaction-polygon.safe.global',
+    'arb1': 'https://safe-transaction-arbitrum.safe.global',
+    'oeth': 'https://safe-transaction-optimism.safe.global',
+    'base': 'https://safe-transaction-base.safe.global',
+}
+DEFAULT_CHAIN = 'eth'
+
+# Request budget per chain; each chain's service is rate limited separately
+REQUESTS_PER_SECOND = 5
+POOL_SIZE = 4
+
+def parse_chain_address(address, default_chain=DEFAULT_CHAIN):
+    """
+    Splits a chain-prefixed Safe address ("matic:0x...") into its chain and address.
+
+    Args:
+        address (str): The address, with or without a chain prefix.
+        default_chain (str): Chain to assume when there is no prefix.
+
+    Returns:
+        tuple: (chain, address)
+
+    Raises:
+        ValueError: If the chain prefix is not supported.
+    """
+    chain, _, bare_address = address.rpartition(':')
+    chain = chain or default_chain
+    if chain not in CHAIN_SERVICE_URLS:
+        raise ValueError(f"Unsupported chain '{chain}' for Safe {bare_address}")
+    return chain, bare_address
+
+class ChainClient:
+    """HTTP client for one chain's Safe transaction service, with its own connection pool and rate budget."""
+
+    def __init__(self, chain, requests_per_second=REQUESTS_PER_SECOND, pool_size=POOL_SIZE):
+        self.chain = chain
+        self.base_url = f'{CHAIN_SERVICE_URLS[chain]}/api/v1/safes'
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=3)
+        self.session.mount('https://', adapter)
+        self.min_interval = 1.0 / requests_per_second
+        self._next_request_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        # Space requests out to stay within this chain's rate budget
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+        return self.session.get(url, timeout=10)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_chain_client(chain):
+    with _clients_lock:
+        if chain not in _clients:
+            _clients[chain] = ChainClient(chain)
+        return _clients[chain]
+
+# Contributor wallet sheet; its Safe rows link to app.safe.global with a chain-prefixed address
+WALLETS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Projects', 'Executive Operations',
+                           'Databases', 'Project Report & Contributor Data - wallet.csv')
+
+def load_wallet_safes(path=WALLETS_CSV):
+    """
+    Reads the chain-prefixed addresses of all Safes in the contributor wallet sheet.
+
+    Args:
+        path (str): Path to the wallet CSV.
+
+    Returns:
+        list: Unique chain-prefixed Safe addresses, e.g. "matic:0x...".
+    """
+    safes = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            link = row.get('Explorer Link') or ''
+            safe = parse_qs(urlparse(link).query).get('safe')
+            if safe and safe[0] not in safes:
+                safes.append(safe[0])
+    return safes
+
+def get_safe_info(address):
+    """
+    Fetches the Safe itself (address, signing threshold, owners) without its transactions or assets.
+
+    Args:
+        address (str): The wallet address, optionally chain-prefixed (e.g. "matic:0x...").
+
+    Returns:
+        dict: The JSON response from the API, with the Safe's chain added.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails.
+    """
+    chain, bare_address = parse_chain_address(address)
+    client = get_chain_client(chain)
+    response = client.get(f'{client.base_url}/{bare_address}/')
+    response.raise_for_status()
+    safe_data = response.json()
+    safe_data['chain'] = chain
+    return safe_data
+
+def iter_transaction_pages(address, start_url=None):
+    """
+    Pages through all transactions of a Safe.
+
+    Args:
+        address (str): The wallet address, optionally chain-prefixed (e.g. "matic:0x...").
+        start_url (str): Page to start from, e.g. the 'next' URL of the last page a previous run committed.
+
+    Yields:
+        tuple: (page url, list of transactions on the page, url of the next page or None)
+
+    Raises:
+        requests.exceptions.RequestException: If a page can't be fetched.
+    """
+    chain, bare_address = parse_chain_address(address)
+    client = get_chain_client(chain)
+    next_url = start_url or f'{client.base_url}/{bare_address}/all-transactions/'
+    while next_url:
+        url = next_url
+        response = client.get(url)
+        response.raise_for_status()
+        data = response.json()
+        next_url = data['next']
+        yield url, data['results'], next_url
+
+def for_each_chain(addresses, fetch):
+    """
+    Runs fetch(address) for many Safes, with one worker per chain so chains are fetched concurrently
+    while each chain's Safes share that chain's rate budget.
+
+    Args:
+        addresses (list): Chain-prefixed Safe addresses.
+        fetch (callable): Called with each address.
+
+    Returns:
+        dict: address -> the value fetch returned for it.
+    """
+    by_chain = defaultdict(list)
+    for address in addresses:
+        by_chain[parse_chain_address(address)[0]].append(address)
+
+    def fetch_chain(chain_addresses):
+        return {address: fetch(address) for address in chain_addresses}
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(by_chain))) as pool:
+        for chain_results in pool.map(fetch_chain, by_chain.values()):
+            results.update(chain_results)
+    return results
+
 def get_safe_data(address):
     """
     Fetches data from the Safe.Global API for a given address, including all transaction data, the signing threshold, owners, and assets.
 
     Args:
-        address (str): The wallet address.
+        address (str): The wallet address, optionally chain-prefixed (e.g. "matic:0x...").
 
     Returns:
         dict: The JSON response from the API, or None if an error occurs.
     """
-    safe_url = f'https://safe-transaction-mainnet.safe.global/api/v1/safes/{address}/'
-    transactions_url = f'https://safe-transaction-mainnet.safe.global/api/v1/safes/{address}/all-transactions/'
-    assets_url = f'https://safe-transaction-mainnet.safe.global/api/v1/safes/{address}/balances/'
+    try:
+        chain, bare_address = parse_chain_address(address)
+    except ValueError as e:
+        logger.error(str(e))
+        return None
+    client = get_chain_client(chain)
+    safe_url = f'{client.base_url}/{bare_address}/'
+    assets_url = f'{client.base_url}/{bare_address}/balances/'
     
     try:
         # Get the safe data
-        safe_response = requests.get(safe_url, timeout=10)
+        safe_response = client.get(safe_url)
         
         # Get all transactions data with pagination
         all_transactions = []
-        next_url = transactions_url
-        while next_url:
-            transactions_response = requests.get(next_url, timeout=10)
-            if transactions_response.status_code == 200:
-                data = transactions_response.json()
-                all_transactions.extend(data['results'])
-                next_url = data['next']
-                logger.info(f"Fetched {len(data['results'])} more transactions. Total: {len(all_transactions)}")
-            else:
-                logger.error(f"Failed to fetch transactions. Status: {transactions_response.status_code}")
-                break
+        try:
+            for _, transactions, _ in iter_transaction_pages(address):
+                all_transactions.extend(transactions)
+                logger.info(f"Fetched {len(transactions)} more transactions. Total: {len(all_transactions)}")
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"Failed to fetch transactions. Status: {e.response.status_code}")
         
         # Get assets data
-        assets_response = requests.get(assets_url, timeout=10)
+        assets_response = client.get(assets_url)
         
         # Check if the responses are successful
         if safe_response.status_code == 200 and all_transactions and assets_response.status_code == 200:
@@ -78,6 +246,7 @@ def get_safe_data(address):
             safe_data['threshold'] = threshold
             safe_data['owners'] = owners
             safe_data['assets'] = assets_data
+            safe_data['chain'] = chain
             
             logger.info(f"Processed {len(all_transactions)} transactions and {len(assets_data)} assets for Safe {address}")
             return safe_data
@@ -0,0 +1,89 @@
+# get_snapi_articles.py
+# Pages through the Spaceflight News API by timestamp (keyset pagination) instead of by offset, so articles
+# published while we page can't shift the window and cause skips or duplicates.
+
+import time
+import logging
+import requests
+
+logger = logging.getLogger(__name__)
+
+SPACEFLIGHT_NEWS_API_URL = "https://api.spaceflightnewsapi.net/v4/articles"
+PAGE_LIMIT = 100  # Maximum allowed by the API
+
+def iter_article_pages(field, since, state=None):
+    """
+    Pages through the articles whose published_at or updated_at is at or after a timestamp, oldest first.
+
+    Each page starts at the last timestamp of the previous one; the articles repeated at that timestamp are dropped,
+    so only the ids at the current cursor need to be remembered.
+
+    Args:
+        field (str): 'published_at' or 'updated_at'.
+        since (str): ISO timestamp to start from.
+        state (dict): Paging state to continue from, as yielded by a previous call.
+
+    Yields:
+        tuple: (state of this page, new articles on the page, state of the next page or None after the last page)
+
+    Raises:
+        requests.exceptions.RequestException: If a page can't be fetched.
+    """
+    state = state or {'cursor': since, 'offset': 0, 'seen': []}
+    while state:
+        params = {
+            'limit': PAGE_LIMIT,
+            'offset': state['offset'],
+            f'{field}_gte': state['cursor'],
+            'ordering': field
+        }
+        response = requests.get(SPACEFLIGHT_NEWS_API_URL, params=params)
+        response.raise_for_status()
+        results = response.json()['results']
+
+        seen = set(state['seen'])
+        articles = [article for article in results if article['id'] not in seen]
+
+        if len(results) < PAGE_LIMIT:
+            next_state = None  # No more articles to fetch
+        elif results[-1][field] == state['cursor']:
+            # A whole page shares one timestamp; step over it with the offset
+            next_state = {'cursor': state['cursor'], 'offset': state['offset'] + PAGE_LIMIT,
+                          'seen': sorted(seen | {article['id'] for article in results})}
+        else:
+            cursor = results[-1][field]
+            next_state = {'cursor': cursor, 'offset': 0,
+                          'seen': [article['id'] for article in results if article[field] == cursor]}
+
+        yield state, articles, next_state
+        state = next_state
+
+        # Respect rate limits (10 requests per second)
+        if state:
+            time.sleep(0.1)
+
+def iter_articles_by_id(ids):
+    """
+    Fetches specific articles, PAGE_LIMIT ids per request.
+
+    Args:
+        ids (list): Article ids.
+
+    Yields:
+        list: The articles of each request; ids the API no longer has are missing.
+
+    Raises:
+        requests.exceptions.RequestException: If a page can't be fetched.
+    """
+    ids = list(ids)
+    for start in range(0, len(ids), PAGE_LIMIT):
+        batch = ids[start:start + PAGE_LIMIT]
+        params = {'ids': ','.join(str(article_id) for article_id in batch), 'limit': PAGE_LIMIT}
+        response = requests.get(SPACEFLIGHT_NEWS_API_URL, params=params)
+        response.raise_for_status()
+        yield response.json()['results']
+
+        # Respect rate limits (10 requests per second)
+        time.sleep(0.1)
+
+__all__ = ['iter_article_pages', 'iter_articles_by_id', 'SPACEFLIGHT_NEWS_API_URL']
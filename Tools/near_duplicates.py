@@ -0,0 +1,174 @@
+# near_duplicates.py
+# Detects near-duplicate articles (the same story syndicated across several news sites) with MinHash signatures
+# over shingled title + summary text, bucketed with LSH so a lookup only compares against likely candidates.
+# The index is persisted as a JSON file together with each article's analysis, so a duplicate can reuse it.
+
+import os
+import re
+import json
+import random
+import struct
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+NUM_PERMUTATIONS = 128
+NUM_BANDS = 32                 # 32 bands of 4 rows: pairs above ~0.4 similarity become candidates
+SHINGLE_SIZE = 3               # words per shingle
+DEFAULT_THRESHOLD = 0.8        # estimated Jaccard similarity required to treat two articles as duplicates
+DEFAULT_RETENTION_DAYS = 30
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+# Fixed seed so signatures stay comparable across runs
+_rng = random.Random(1)
+_PERMUTATIONS = [(_rng.randint(1, _MERSENNE_PRIME - 1), _rng.randint(0, _MERSENNE_PRIME - 1))
+                 for _ in range(NUM_PERMUTATIONS)]
+
+def _shingles(text):
+    words = _WORD.findall(text.casefold())
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def _stable_hash(shingle):
+    # Python's hash() is salted per process, so use a digest to keep signatures stable across runs
+    return struct.unpack('<I', hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest())[0]
+
+def minhash_signature(text):
+    """
+    Computes the MinHash signature of a text.
+
+    Args:
+        text (str): The text to sign, e.g. an article's title and summary.
+
+    Returns:
+        list: NUM_PERMUTATIONS integers, or an empty list if the text has no words.
+    """
+    hashes = [_stable_hash(s) for s in _shingles(text)]
+    if not hashes:
+        return []
+    return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS]
+
+def estimate_similarity(sig_a, sig_b):
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERMUTATIONS
+
+# Trailing " - Site"/" | Site" appended to syndicated titles; " - " is only stripped when followed by the news site
+_PIPE_SUFFIX = re.compile(r'\s+[|\u2022]\s+[^|\u2022]{1,40}$')
+_DASH_SUFFIX = re.compile(r'\s+[-\u2013\u2014:]\s+([^-\u2013\u2014:]{1,40})$')
+
+def strip_site_suffix(title, news_site=None):
+    """
+    Removes the site name syndicated copies append to a title, e.g. "Starship flies again - Spaceflight Now".
+
+    Args:
+        title (str): The article title.
+        news_site (str): The article's news site, as reported by the API.
+
+    Returns:
+        str: The title without the suffix.
+    """
+    title = _PIPE_SUFFIX.sub('', title)
+    match = _DASH_SUFFIX.search(title)
+    if match and news_site and _WORD.findall(match.group(1).casefold()) == _WORD.findall(news_site.casefold()):
+        title = title[:match.start()]
+    return title
+
+def article_text(article):
+    title = strip_site_suffix(article.get('title') or '', article.get('news_site'))
+    return f"{title}\n\n{article.get('summary') or ''}"
+
+class NearDuplicateIndex:
+    """
+    Persistent MinHash LSH index of recently analyzed articles.
+
+    Raising threshold favours precision (fewer false duplicates), lowering it saves more LLM calls.
+    """
+
+    def __init__(self, path, threshold=DEFAULT_THRESHOLD, retention_days=DEFAULT_RETENTION_DAYS):
+        self.path = path
+        self.threshold = threshold
+        self.retention_days = retention_days
+        self.entries = {}      # article id (str) -> {'published_at', 'signature', 'analysis'}
+        self.buckets = {}      # band key -> set of article ids
+        self.duplicates_found = 0
+
+    def load(self):
+        """Loads the index from disk, dropping entries older than the retention window."""
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+            for article_id, entry in data.get('entries', {}).items():
+                published_at = entry.get('published_at')
+                if published_at and datetime.fromisoformat(published_at.replace('Z', '+00:00')) < cutoff:
+                    continue
+                self._insert(article_id, entry)
+        logger.info(f"Loaded {len(self.entries)} articles into the near-duplicate index")
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self.entries}, f)
+        os.replace(tmp_path, self.path)
+
+    def _band_keys(self, signature):
+        rows = NUM_PERMUTATIONS // NUM_BANDS
+        return [f"{band}:" + ','.join(map(str, signature[band * rows:(band + 1) * rows]))
+                for band in range(NUM_BANDS)]
+
+    def _insert(self, article_id, entry):
+        self.entries[article_id] = entry
+        for key in self._band_keys(entry['signature']):
+            self.buckets.setdefault(key, set()).add(article_id)
+
+    def find_duplicate(self, article):
+        """
+        Finds an analyzed article that the given article is a near-duplicate of.
+
+        Args:
+            article (dict): An article from the Spaceflight News API.
+
+        Returns:
+            tuple: (original article id, similarity, analysis dict), or None if there is no match above the threshold.
+        """
+        signature = minhash_signature(article_text(article))
+        if not signature:
+            return None
+
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates |= self.buckets.get(key, set())
+        candidates.discard(str(article['id']))
+
+        best = None
+        for candidate_id in candidates:
+            similarity = estimate_similarity(signature, self.entries[candidate_id]['signature'])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (candidate_id, similarity)
+
+        if best is None:
+            return None
+        self.duplicates_found += 1
+        return int(best[0]) if best[0].isdigit() else best[0], best[1], self.entries[best[0]]['analysis']
+
+    def add(self, article, analysis):
+        """Records an analyzed article so later copies of the same story can reuse its analysis."""
+        signature = minhash_signature(article_text(article))
+        if not signature:
+            return
+        self._insert(str(article['id']), {
+            'published_at': article.get('published_at'),
+            'signature': signature,
+            'analysis': analysis,
+        })
+
+__all__ = ['NearDuplicateIndex', 'minhash_signature', 'estimate_similarity', 'strip_site_suffix']
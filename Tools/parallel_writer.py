@@ -0,0 +1,154 @@
+# parallel_writer.py
+# Writes batches of items to Neo4j from several worker threads.
+#
+# - Items are partitioned by a key (e.g. Safe address, transaction hash prefix, article id) so each worker writes
+#   disjoint data and workers rarely wait on each other's locks.
+# - Every batch runs through session.execute_write, which retries transient errors such as deadlocks; batches that
+#   still fail are retried a few more times with backoff, then split into single items to isolate the bad ones.
+# - Nodes that many batches share (common Addresses, popular Topics) should be created up front with precreate(),
+#   serially, so workers only MATCH them instead of racing to MERGE them.
+# - With bump_version=True every batch transaction also bumps the graph write version (Tools/run_cypher.py);
+#   each partition bumps its own version node, so the workers don't serialize on a single one.
+
+import time
+import zlib
+import random
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from neo4j.exceptions import TransientError
+from Tools.run_cypher import bump_write_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+MAX_BATCH_ATTEMPTS = 3
+
+def partition_for(key, workers):
+    """Maps a partition key to a worker index; stable across runs, unlike hash()."""
+    return zlib.crc32(str(key).encode('utf-8')) % workers
+
+def precreate(session, query, rows, batch_size=1000):
+    """
+    Serially creates shared nodes before a parallel write.
+
+    Args:
+        session: An open Neo4j session.
+        query (str): An UNWIND $rows ... MERGE query.
+        rows (list): The rows to pass as $rows.
+        batch_size (int): Rows per transaction.
+    """
+    for start in range(0, len(rows), batch_size):
+        session.execute_write(lambda tx, batch: tx.run(query, rows=batch).consume(), rows[start:start + batch_size])
+
+class ParallelWriter:
+    """
+    Writes items with a pool of workers, one session per worker.
+
+    write_batch(tx, batch) is the transaction function for a list of items; it may be called more than once
+    for the same batch when a transaction is retried, so it must be idempotent (MERGE-based).
+    With bump_version, the graph write version is bumped in the same transaction as each batch.
+    """
+
+    def __init__(self, driver, workers=1, batch_size=DEFAULT_BATCH_SIZE, database=None, bump_version=False):
+        self.driver = driver
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.database = database
+        self.bump_version = bump_version
+        self.stats = defaultdict(int)
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def write(self, items, partition_key, write_batch):
+        """
+        Writes items in parallel, partitioned by key.
+
+        Args:
+            items (list): The items to write.
+            partition_key (callable): Returns the partition key of an item.
+            write_batch (callable): Transaction function called as write_batch(tx, batch).
+
+        Returns:
+            tuple: (list of committed items, list of (item, exception) for the items that failed)
+        """
+        partitions = defaultdict(list)
+        for item in items:
+            partitions[partition_for(partition_key(item), self.workers)].append(item)
+
+        if self.workers == 1 or len(partitions) <= 1:
+            results = [self._write_partition(index, part, write_batch) for index, part in partitions.items()]
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(self._write_partition, index, part, write_batch)
+                           for index, part in partitions.items()]
+                results = [future.result() for future in futures]
+
+        committed = [item for done, _ in results for item in done]
+        failed = [failure for _, failures in results for failure in failures]
+        return committed, failed
+
+    def _write_partition(self, partition, items, write_batch):
+        # A single writer keeps using the global version node
+        if self.bump_version:
+            version_partition = partition if self.workers > 1 else None
+            write_batch = self._with_version_bump(write_batch, version_partition)
+
+        committed, failed = [], []
+        with self.driver.session(database=self.database) as session:
+            for start in range(0, len(items), self.batch_size):
+                batch = items[start:start + self.batch_size]
+                try:
+                    self._write_with_retry(session, batch, write_batch)
+                    committed.extend(batch)
+                except Exception as e:
+                    if len(batch) == 1:
+                        failed.append((batch[0], e))
+                        continue
+                    logger.warning(f"Batch of {len(batch)} items failed ({e}). Writing its items one by one.")
+                    for item in batch:
+                        try:
+                            self._write_with_retry(session, [item], write_batch)
+                            committed.append(item)
+                        except Exception as item_error:
+                            failed.append((item, item_error))
+        return committed, failed
+
+    @staticmethod
+    def _with_version_bump(write_batch, partition):
+        def write_and_bump(tx, batch):
+            result = write_batch(tx, batch)
+            bump_write_version(tx, partition)
+            return result
+        return write_and_bump
+
+    def _write_with_retry(self, session, batch, write_batch):
+        attempts = {'calls': 0}
+
+        def work(tx, items):
+            attempts['calls'] += 1
+            return write_batch(tx, items)
+
+        for attempt in range(1, MAX_BATCH_ATTEMPTS + 1):
+            try:
+                session.execute_write(work, batch)
+                break
+            except TransientError as e:
+                # execute_write already retried for max_transaction_retry_time; back off and try again
+                if 'Deadlock' in (e.code or ''):
+                    self._count('deadlocks')
+                if attempt == MAX_BATCH_ATTEMPTS:
+                    raise
+                time.sleep(random.uniform(0.5, 1.5) * 2 ** attempt)
+        self._count('batches')
+        self._count('transaction_retries', attempts['calls'] - 1)
+
+    def log_stats(self):
+        logger.info(f"Parallel writer ({self.workers} workers): {self.stats['batches']} batches committed, "
+                    f"{self.stats['transaction_retries']} transaction retries, {self.stats['deadlocks']} deadlocks")
+
+__all__ = ['ParallelWriter', 'precreate', 'partition_for']
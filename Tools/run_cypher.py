@@ -1,19 +1,196 @@
 # This script is used to run cypher queries on the graph database
 # It accepts a cypher query as a command line argument and runs it
+#
+# Read queries can optionally be served from a result cache (run_cypher(query, params, cache=True)).
+# Cached results are tagged with the graph-wide write version: the sum of the counters on the GraphVersion nodes,
+# which every ingester bumps in the same transaction as its writes (see bump_write_version). Serial writers bump the
+# (:GraphVersion {name: 'global'}) node; parallel writers each bump their own partition's node, so they don't
+# contend on one hot node. A cache hit then only costs one cheap version lookup, and any committed ingestion
+# invalidates every cached result.
 
 import os
+import re
+import json
+import pickle
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 NEO4J_URI = os.getenv('NEO4J_URI')
 NEO4J_USER = os.getenv('NEO4J_USER')
 NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD')
 
+# Optional on-disk cache file (SQLite in WAL mode), shared between processes (e.g. newsletter and reporting scripts)
+QUERY_CACHE_PATH = os.getenv('QUERY_CACHE_PATH')
+QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', '256'))
+
+# Every counter only grows, so their sum changes whenever any of them is bumped
+WRITE_VERSION_QUERY = "MATCH (v:GraphVersion) RETURN sum(v.version) AS version"
+
+BUMP_WRITE_VERSION_QUERY = """
+MERGE (v:GraphVersion {name: $name})
+SET v.version = coalesce(v.version, 0) + 1
+"""
+
+def bump_write_version(tx, partition=None):
+    """
+    Marks the graph as changed so cached read results are invalidated.
+    Call it from the same transaction as the writes, ideally as its last statement to keep the lock short.
+
+    Args:
+        tx: A Neo4j transaction (or session) to run the bump in.
+        partition (int): Parallel writer partition; each partition bumps its own version node.
+    """
+    tx.run(BUMP_WRITE_VERSION_QUERY, name='global' if partition is None else f'partition-{partition}')
+
+def get_write_version(session):
+    record = session.run(WRITE_VERSION_QUERY).single()
+    return record['version'] if record else 0
+
+def cache_key(query, params=None):
+    """Builds a cache key from the whitespace-normalized query text and its parameters."""
+    normalized = re.sub(r'\s+', ' ', query).strip()
+    payload = json.dumps([normalized, params or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class QueryCache:
+    """
+    LRU cache of query results keyed by cache_key(), with an optional on-disk layer (SQLite) behind it.
+    Entries are stored with the write version they were read at and are only served for that version.
+    The disk layer is safe to share between processes; if it can't be read or written, the lookup is
+    treated as a miss and the query runs against the graph.
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, disk_path=QUERY_CACHE_PATH):
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None and self.disk_path:
+                entry = self._disk_get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self._evict()
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, data):
+        with self._lock:
+            self.entries[key] = (version, data)
+            self.entries.move_to_end(key)
+            self._evict()
+            if self.disk_path:
+                self._disk_put(key, version, data)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            if self.disk_path:
+                try:
+                    conn = self._disk()
+                    try:
+                        with conn:
+                            conn.execute("DELETE FROM results")
+                    finally:
+                        conn.close()
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not clear the query cache at {self.disk_path}: {e}")
+
+    def _disk(self):
+        # A short-lived connection per operation; WAL lets readers in other processes proceed during a write
+        conn = sqlite3.connect(self.disk_path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, version INTEGER, data BLOB)")
+        return conn
+
+    def _disk_get(self, key):
+        try:
+            conn = self._disk()
+            try:
+                row = conn.execute("SELECT version, data FROM results WHERE key = ?", (key,)).fetchone()
+            finally:
+                conn.close()
+            return (row[0], pickle.loads(row[1])) if row else None
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError) as e:
+            logger.warning(f"Query cache read failed ({e}); running the query instead.")
+            return None
+
+    def _disk_put(self, key, version, data):
+        try:
+            conn = self._disk()
+            try:
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                                 (key, version, pickle.dumps(data)))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Query cache write failed ({e}); the result is only cached in memory.")
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+default_cache = QueryCache()
+
+def cached_read(session, query, params=None, cache=None):
+    """
+    Runs a read query through the result cache on an already open session.
+
+    Args:
+        session: An open Neo4j session.
+        query (str): The cypher read query.
+        params (dict): Query parameters.
+        cache (QueryCache): The cache to use, defaults to the shared default cache.
+
+    Returns:
+        list: The query result as a list of dicts.
+    """
+    query_cache = cache or default_cache
+    key = cache_key(query, params)
+    version = get_write_version(session)
+    data = query_cache.get(key, version)
+    if data is None:
+        data = session.run(query, params).data()
+        query_cache.put(key, version, data)
+    return data
+
 # Function to run a cypher query
-def run_cypher(query, params=None):
+def run_cypher(query, params=None, cache=False):
+    """
+    Runs a cypher query and returns its records as a list of dicts.
+
+    Args:
+        query (str): The cypher query.
+        params (dict): Query parameters.
+        cache (bool or QueryCache): Serve the result from a cache (True uses the shared default cache).
+            Only use this for read queries.
+
+    Returns:
+        list: The query result as a list of dicts.
+    """
     with GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD)) as driver:
         with driver.session() as session:
-            result = session.run(query, params)
-            return result.data()
+            if not cache:
+                result = session.run(query, params)
+                return result.data()
+            return cached_read(session, query, params, None if cache is True else cache)
+
+__all__ = ['run_cypher', 'cached_read', 'bump_write_version', 'get_write_version', 'QueryCache', 'default_cache']
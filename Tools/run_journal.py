@@ -0,0 +1,219 @@
+# run_journal.py
+# Local SQLite journal shared by the ingestion pipelines (ingest_safe.py, SNAPI_ingestion.py).
+# It records the pages fetched by each run, which pages/items were committed to the graph, and the items that
+# failed along with the reason, so an interrupted run can be resumed (--resume) and failures replayed (--retry-failed).
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from functools import wraps
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_JOURNAL_PATH = os.getenv('RUN_JOURNAL_PATH', os.path.join(PROJECT_ROOT, 'Cache', 'run_journal.sqlite'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pipeline TEXT NOT NULL,
+    target TEXT NOT NULL,
+    params TEXT,
+    status TEXT NOT NULL DEFAULT 'running',
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS pages (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    page_key TEXT NOT NULL,
+    next_key TEXT,
+    payload TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    committed_at TEXT,
+    PRIMARY KEY (run_id, page_key)
+);
+CREATE TABLE IF NOT EXISTS items (
+    pipeline TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    target TEXT NOT NULL,
+    run_id INTEGER,
+    status TEXT NOT NULL,
+    reason TEXT,
+    payload TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (pipeline, item_key)
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (pipeline, target, status);
+"""
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+def _locked(method):
+    # The connection is shared by the per-chain ingestion threads, so one journal call runs at a time
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class RunJournal:
+    """
+    SQLite-backed journal of ingestion runs.
+
+    Every write is committed immediately so the journal survives the process dying at any point.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+
+    @_locked
+    def close(self):
+        self.conn.close()
+
+    @_locked
+    def start_run(self, pipeline, target, params=None, resume=False):
+        """
+        Starts a run, or picks up the latest unfinished run for the same pipeline and target when resuming.
+
+        Args:
+            pipeline (str): Pipeline name, e.g. 'safe' or 'snapi'.
+            target (str): What the run ingests, e.g. a Safe address.
+            params (dict): Parameters the run was started with, restored on resume.
+            resume (bool): Whether to continue the last unfinished run.
+
+        Returns:
+            tuple: (run_id, params, resumed)
+        """
+        if resume:
+            row = self.conn.execute(
+                "SELECT run_id, params FROM runs WHERE pipeline = ? AND target = ? AND status = 'running' "
+                "ORDER BY run_id DESC LIMIT 1",
+                (pipeline, target)
+            ).fetchone()
+            if row:
+                logger.info(f"Resuming {pipeline} run {row['run_id']} for {target}")
+                return row['run_id'], json.loads(row['params'] or '{}'), True
+            logger.info(f"No unfinished {pipeline} run for {target} to resume. Starting a new run.")
+
+        with self.conn:
+            # A new run supersedes any unfinished one for the same target
+            self.conn.execute(
+                "UPDATE runs SET status = 'abandoned', finished_at = ? "
+                "WHERE pipeline = ? AND target = ? AND status = 'running'",
+                (_now(), pipeline, target)
+            )
+            cursor = self.conn.execute(
+                "INSERT INTO runs (pipeline, target, params, started_at) VALUES (?, ?, ?, ?)",
+                (pipeline, target, json.dumps(params or {}), _now())
+            )
+        return cursor.lastrowid, params or {}, False
+
+    @_locked
+    def finish_run(self, run_id):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE runs SET status = 'completed', finished_at = ? WHERE run_id = ?", (_now(), run_id)
+            )
+
+    @_locked
+    def record_page(self, run_id, page_key, payload, next_key=None):
+        """Records a fetched page so a resumed run doesn't need to fetch it again."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (run_id, page_key, next_key, payload, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (run_id, str(page_key), None if next_key is None else str(next_key), json.dumps(payload), _now())
+            )
+
+    @_locked
+    def commit_page(self, run_id, page_key):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE pages SET committed_at = ? WHERE run_id = ? AND page_key = ?", (_now(), run_id, str(page_key))
+            )
+
+    @_locked
+    def pages(self, run_id):
+        """Returns the pages fetched by a run in fetch order, as dicts with the payload decoded."""
+        rows = self.conn.execute(
+            "SELECT page_key, next_key, payload, committed_at FROM pages WHERE run_id = ? ORDER BY rowid", (run_id,)
+        ).fetchall()
+        return [
+            {
+                'page_key': row['page_key'],
+                'next_key': row['next_key'],
+                'payload': json.loads(row['payload']),
+                'committed': row['committed_at'] is not None,
+            }
+            for row in rows
+        ]
+
+    def commit_item(self, pipeline, target, item_key, run_id=None):
+        self.commit_items(pipeline, target, [item_key], run_id)
+
+    @_locked
+    def commit_items(self, pipeline, target, item_keys, run_id=None):
+        """Marks a batch of items committed in a single journal transaction."""
+        now = _now()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO items (pipeline, item_key, target, run_id, status, updated_at) "
+                "VALUES (?, ?, ?, ?, 'committed', ?) "
+                "ON CONFLICT (pipeline, item_key) DO UPDATE SET "
+                "status = 'committed', reason = NULL, payload = NULL, run_id = excluded.run_id, "
+                "updated_at = excluded.updated_at",
+                [(pipeline, str(key), target, run_id, now) for key in item_keys]
+            )
+
+    @_locked
+    def fail_item(self, pipeline, target, item_key, reason, payload, run_id=None):
+        """Adds an item to the dead-letter list with the reason it failed and the payload needed to replay it."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO items (pipeline, item_key, target, run_id, status, reason, payload, attempts, updated_at) "
+                "VALUES (?, ?, ?, ?, 'failed', ?, ?, 1, ?) "
+                "ON CONFLICT (pipeline, item_key) DO UPDATE SET "
+                "status = 'failed', reason = excluded.reason, payload = excluded.payload, run_id = excluded.run_id, "
+                "attempts = items.attempts + 1, updated_at = excluded.updated_at",
+                (pipeline, str(item_key), target, run_id, str(reason), json.dumps(payload), _now())
+            )
+
+    @_locked
+    def is_committed(self, pipeline, item_key, run_id=None):
+        """Checks whether an item was committed, by any run or only by the given run."""
+        query = "SELECT 1 FROM items WHERE pipeline = ? AND item_key = ? AND status = 'committed'"
+        args = [pipeline, str(item_key)]
+        if run_id is not None:
+            query += " AND run_id = ?"
+            args.append(run_id)
+        return self.conn.execute(query, args).fetchone() is not None
+
+    @_locked
+    def failed_items(self, pipeline, target=None):
+        """Returns the dead-letter items of a pipeline (optionally for one target) as dicts with the payload decoded."""
+        query = "SELECT item_key, target, reason, payload, attempts FROM items WHERE pipeline = ? AND status = 'failed'"
+        args = [pipeline]
+        if target is not None:
+            query += " AND target = ?"
+            args.append(target)
+        return [
+            {
+                'item_key': row['item_key'],
+                'target': row['target'],
+                'reason': row['reason'],
+                'payload': json.loads(row['payload']),
+                'attempts': row['attempts'],
+            }
+            for row in self.conn.execute(query + " ORDER BY updated_at", args)
+        ]
+
+__all__ = ['RunJournal', 'DEFAULT_JOURNAL_PATH']